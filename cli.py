@@ -1,16 +1,20 @@
-import sys
+import argparse
 from typing import Optional
 
+from recipe_agent import deadline
 from recipe_agent.agent import RecipeAgent
 from recipe_agent.client import OpenRouterClient
-from recipe_agent.config import DEFAULT_MODEL, SYSTEM_MESSAGES
+from recipe_agent.config import DEFAULT_MODEL, REQUEST_DEADLINE_SECONDS, SYSTEM_MESSAGES
 from recipe_agent.utils import load_api_key
 from recipe_agent.logging_utils import setup_logging
 
+DEFAULT_PROMPT = "Give recipe for a coffee cake and the nutrtional breakdown for 200 grams of the cake"
+
 
 def run_agent(
     prompt: str,
     api_key: Optional[str],
+    deadline_seconds: Optional[float] = REQUEST_DEADLINE_SECONDS,
 ) -> str:
     if not api_key:
         raise RuntimeError("Missing OPENROUTER_API_KEY. Add it to .env or your environment before running.")
@@ -18,7 +22,8 @@ def run_agent(
     client = OpenRouterClient(api_key=api_key, model=DEFAULT_MODEL)
     agent = RecipeAgent(client)
     system_prompt = SYSTEM_MESSAGES[0]["content"]
-    result = agent.run(prompt, system_prompt)
+    with deadline.use(deadline.Deadline(deadline_seconds)):
+        result = agent.run(prompt, system_prompt)
 
     reply = result["reply"]
     trace = result["trace"]
@@ -30,13 +35,24 @@ def run_agent(
     return "\n".join(output_lines)
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Ask the recipe agent a question")
+    parser.add_argument("prompt", nargs="*", help="Prompt text (a coffee cake example if omitted)")
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=REQUEST_DEADLINE_SECONDS,
+        help=f"Overall time limit in seconds, 0 for none (default {REQUEST_DEADLINE_SECONDS:g})",
+    )
+    args = parser.parse_args()
+
     setup_logging()
     api_key = load_api_key()
-    prompt = "Give recipe for a coffee cake and the nutrtional breakdown for 200 grams of the cake"
-    if len(sys.argv) > 1:
-        prompt = " ".join(sys.argv[1:])
+    prompt = " ".join(args.prompt) or DEFAULT_PROMPT
 
-    print(run_agent(prompt, api_key))
+    try:
+        print(run_agent(prompt, api_key, args.deadline or None))
+    except deadline.DeadlineExceeded as exc:
+        raise SystemExit(f"Timed out after {args.deadline:g}s: {exc}") from exc
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,26 @@
-from recipe_agent.agent import RecipeAgent
-from recipe_agent.client import OpenRouterClient
-from recipe_agent.config import DEFAULT_MODEL
+import importlib
+from typing import Any
 
-__all__ = ["RecipeAgent", "OpenRouterClient", "DEFAULT_MODEL"]
+# Public names are resolved on first access so `import recipe_agent` stays cheap
+_EXPORTS = {
+    "RecipeAgent": "recipe_agent.agent",
+    "OpenRouterClient": "recipe_agent.client",
+    "DEFAULT_MODEL": "recipe_agent.config",
+    "calculate_recipes_nutrition": "recipe_agent.tools",
+    "scale_recipes": "recipe_agent.tools",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module 'recipe_agent' has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(list(globals()) + __all__)
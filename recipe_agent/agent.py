@@ -1,8 +1,17 @@
 import json
-from typing import Any, Dict, List, Optional
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
+from recipe_agent import deadline, prefetch, recorder
 from recipe_agent.client import OpenRouterClient
-from recipe_agent.config import DEFAULT_MODEL
+from recipe_agent.config import (
+    DEADLINE_FINAL_ANSWER_SECONDS,
+    DEFAULT_MODEL,
+    ROUTING_MAX_TOKENS,
+    ROUTING_MODEL,
+    ROUTING_STOP_PROMPT,
+    ROUTING_UNCAPPED_TOOLS,
+)
 from recipe_agent.tools import build_tools
 from recipe_agent.logging_utils import get_logger
 
@@ -11,9 +20,11 @@ class RecipeAgent:
     def __init__(
         self,
         client: OpenRouterClient,
+        routing_model: Optional[str] = ROUTING_MODEL,
     ):
         self.client = client
         self.model = DEFAULT_MODEL
+        self.routing_model = routing_model
         self.tools = build_tools()
         self.logger = get_logger(__name__)
 
@@ -24,17 +35,107 @@ class RecipeAgent:
         self,
         user_prompt: str,
         system_prompt: Optional[str] = None,
+        history: Optional[List[Dict[str, Any]]] = None,
     ) -> Dict[str, Any]:
-        messages: List[Dict[str, Any]] = []
+        """
+        Answer user_prompt. `history` is the `messages` list from an earlier run of the
+        same conversation; the new turn is appended to it instead of starting fresh.
 
-        sys_prompt = system_prompt or ""
-        messages.append({"role": "system", "content": sys_prompt})
+        Runs under the caller's deadline (`deadline.use`), if any: tool turns only get the
+        time left minus DEADLINE_FINAL_ANSWER_SECONDS, which is kept for the answer.
+        DeadlineExceeded is raised if not even an answer fits (or the deadline is cancelled).
+        """
+        deadline.check("agent run")
+        inputs = {
+            "user_prompt": user_prompt,
+            "system_prompt": system_prompt,
+            "history": history,
+            "model": self.client.model,
+            "routing_model": self.routing_model,
+            # Time budget left when the run started (None: no limit); replay runs under the same one
+            "deadline_seconds": deadline.remaining(),
+        }
+        with recorder.get_recorder().run(inputs) as outputs:
+            try:
+                result = self._run(user_prompt, system_prompt, history)
+            finally:
+                # Nutrition prefetches still queued once the run is over are wasted work
+                prefetch.cancel_pending()
+            outputs["reply"] = result["reply"]
+            return result
+
+    def _run(
+        self,
+        user_prompt: str,
+        system_prompt: Optional[str] = None,
+        history: Optional[List[Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+        messages: List[Dict[str, Any]] = list(history or [])
+
+        # A continued conversation keeps its system prompt unless a new one is given
+        if not messages or system_prompt:
+            sys_message = {"role": "system", "content": system_prompt or ""}
+            if messages and messages[0].get("role") == "system":
+                messages[0] = sys_message
+            else:
+                messages.insert(0, sys_message)
         messages.append({"role": "user", "content": user_prompt})
 
         tool_defs = self._tool_defs()
         trace: List[str] = []
+        phases = {
+            "routing": {
+                "model": self.routing_model, "calls": 0, "attempts": 0, "latency_s": 0.0, "tokens": 0,
+                # Turns the routing model's tool calls were kept for, and what those calls cost
+                "accepted": 0, "accepted_latency_s": 0.0, "accepted_tokens": 0,
+                # Routing calls whose output was discarded (stop signal, cut off or escalated): pure overhead
+                "overhead_latency_s": 0.0, "overhead_tokens": 0, "escalations": 0,
+                # Batch tool calls cut off by ROUTING_MAX_TOKENS and redone without the cap
+                "uncapped_retries": 0,
+            },
+            "synthesis": {"model": self.client.model, "calls": 0, "attempts": 0, "latency_s": 0.0, "tokens": 0},
+        }
+
+        request_deadline = deadline.current()
+        message: Dict[str, Any] = {}
+        out_of_time = False
+        # Tool calls that were chosen but not run because time ran out
+        skipped: List[Dict[str, Any]] = []
 
-        message = self.client.chat(messages, tools=tool_defs)
+        # Tool turns get the request's time minus a reserve, so an answer still fits when they run out
+        with deadline.reserve(DEADLINE_FINAL_ANSWER_SECONDS):
+            try:
+                message = self._tool_turns(messages, tool_defs, phases, trace, skipped)
+            except deadline.DeadlineExceeded:
+                # A model call ran into the reserve; only give up if the request itself is over
+                if request_deadline is not None and request_deadline.expired():
+                    raise
+                out_of_time = True
+            out_of_time = out_of_time or deadline.expired()
+
+        if out_of_time:
+            trace.append("Deadline close: skipping remaining tool calls and answering now")
+            message = self._final_answer(messages, skipped, phases)
+            messages.append(message)
+
+        self._routing_savings(phases)
+        trace.extend(self._phase_summary(phases))
+        final_content = message.get("content") or "[No content returned]"
+        return {"reply": final_content, "trace": trace, "messages": messages, "phases": phases}
+
+    def _tool_turns(
+        self,
+        messages: List[Dict[str, Any]],
+        tool_defs: List[Dict[str, Any]],
+        phases: Dict[str, Dict[str, Any]],
+        trace: List[str],
+        skipped: List[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """
+        Alternate model turns and tool calls until the model answers. Stops early, before
+        the next tool or model call, once the current deadline has expired.
+        """
+        message = self._next_message(messages, tool_defs, phases, trace)
         messages.append(message)
 
         max_iterations = 5
@@ -43,7 +144,11 @@ class RecipeAgent:
         #ReACT framework
         while message.get("tool_calls") and iterations < max_iterations:
             iterations += 1
-            
+
+            if deadline.expired():
+                skipped.extend(message["tool_calls"])
+                break
+
             for call in message["tool_calls"]:
                 tool_name = call["function"]["name"]
                 raw_args = call["function"].get("arguments") or "{}"
@@ -75,8 +180,152 @@ class RecipeAgent:
                     }
                 )
 
-            message = self.client.chat(messages, tools=tool_defs)
+            # Tools can use up the rest of the turn budget; don't start a model call that can't finish
+            if deadline.expired():
+                break
+
+            message = self._next_message(messages, tool_defs, phases, trace)
             messages.append(message)
 
-        final_content = message.get("content") or "[No content returned]"
-        return {"reply": final_content, "trace": trace, "messages": messages}
+        return message
+
+    def _final_answer(
+        self,
+        messages: List[Dict[str, Any]],
+        tool_calls: List[Dict[str, Any]],
+        phases: Dict[str, Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """Answer from what is already in the conversation, without offering tools."""
+        # Every tool call needs a result message before the model can take another turn
+        for call in tool_calls:
+            messages.append(
+                {
+                    "role": "tool",
+                    "tool_call_id": call["id"],
+                    "name": call["function"]["name"],
+                    "content": "Skipped: the request is about to reach its time limit. Answer with what you have.",
+                }
+            )
+        return self._chat("synthesis", self.client.model, messages, [], phases)[0]
+
+    def _routing_enabled(self) -> bool:
+        return bool(self.routing_model) and self.routing_model != self.client.model
+
+    def _next_message(
+        self,
+        messages: List[Dict[str, Any]],
+        tool_defs: List[Dict[str, Any]],
+        phases: Dict[str, Dict[str, Any]],
+        trace: List[str],
+    ) -> Dict[str, Any]:
+        """
+        Let the routing model pick the next tool calls. If it signals that no tool is
+        needed, or its tool arguments are not valid JSON, the configured model takes the turn.
+        """
+        if self._routing_enabled():
+            # The stop prompt is only sent on this call; it is not added to the conversation
+            routing_messages = messages + [{"role": "system", "content": ROUTING_STOP_PROMPT}]
+            message, call = self._chat(
+                "routing", self.routing_model, routing_messages, tool_defs, phases, max_tokens=ROUTING_MAX_TOKENS
+            )
+            stats = phases["routing"]
+            if self._cut_off_in_batch_tool(message):
+                stats["overhead_latency_s"] += call["latency_s"]
+                stats["overhead_tokens"] += call["tokens"]
+                stats["uncapped_retries"] += 1
+                trace.append("Routing output hit ROUTING_MAX_TOKENS in a batch tool call; retrying without the cap")
+                message, call = self._chat("routing", self.routing_model, routing_messages, tool_defs, phases)
+            if message.get("tool_calls") and self._valid_tool_arguments(message["tool_calls"]):
+                stats["accepted"] += 1
+                stats["accepted_latency_s"] += call["latency_s"]
+                stats["accepted_tokens"] += call["tokens"]
+                return message
+            stats["overhead_latency_s"] += call["latency_s"]
+            stats["overhead_tokens"] += call["tokens"]
+            if message.get("tool_calls"):
+                stats["escalations"] += 1
+                trace.append(f"Escalating to {self.client.model}: malformed tool arguments from {self.routing_model}")
+
+        return self._chat("synthesis", self.client.model, messages, tool_defs, phases)[0]
+
+    def _chat(
+        self,
+        phase: str,
+        model: str,
+        messages: List[Dict[str, Any]],
+        tool_defs: List[Dict[str, Any]],
+        phases: Dict[str, Dict[str, Any]],
+        max_tokens: Optional[int] = None,
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Call the model and add the call to its phase stats. Returns (message, this call's latency/tokens)."""
+        start = time.perf_counter()
+        message = self.client.chat(messages, tools=tool_defs, model=model, max_tokens=max_tokens)
+        call = {
+            "latency_s": time.perf_counter() - start,
+            "tokens": (self.client.last_usage or {}).get("total_tokens") or 0,
+        }
+        stats = phases[phase]
+        stats["calls"] += 1
+        # More attempts than calls means retries, hedges or fallbacks were needed
+        stats["attempts"] += len(getattr(self.client, "last_attempts", None) or [1])
+        stats["latency_s"] += call["latency_s"]
+        stats["tokens"] += call["tokens"]
+        return message, call
+
+    def _cut_off_in_batch_tool(self, message: Dict[str, Any]) -> bool:
+        """The routing call stopped at max_tokens while writing arguments for a batch tool."""
+        if getattr(self.client, "last_finish_reason", None) != "length":
+            return False
+        return any(
+            (call.get("function") or {}).get("name") in ROUTING_UNCAPPED_TOOLS
+            for call in message.get("tool_calls") or []
+        )
+
+    @staticmethod
+    def _routing_savings(phases: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Estimate what routing saved: baseline (every turn on the configured model) minus actual.
+        Without routing, the accepted turns would have been extra calls to the configured model,
+        costed at its average per call in this run; every other call would have happened anyway.
+        """
+        routing, synthesis = phases["routing"], phases["synthesis"]
+        per_call = {"tokens": 0.0, "latency_s": 0.0}
+        if synthesis["calls"]:
+            per_call = {key: synthesis[key] / synthesis["calls"] for key in per_call}
+        for key in per_call:
+            baseline = synthesis[key] + routing["accepted"] * per_call[key]
+            actual = synthesis[key] + routing[key]
+            routing[f"baseline_{key}"] = baseline
+            routing[f"saved_{key}"] = baseline - actual
+
+    @staticmethod
+    def _valid_tool_arguments(tool_calls: List[Dict[str, Any]]) -> bool:
+        for call in tool_calls:
+            try:
+                json.loads(call["function"].get("arguments") or "{}")
+            except (json.JSONDecodeError, KeyError, TypeError):
+                return False
+        return True
+
+    def _phase_summary(self, phases: Dict[str, Dict[str, Any]]) -> List[str]:
+        lines = []
+        for phase, stats in phases.items():
+            if not stats["calls"]:
+                continue
+            line = (
+                f"phase {phase}: model={stats['model']} calls={stats['calls']} attempts={stats['attempts']} "
+                f"latency={stats['latency_s']:.2f}s tokens={stats['tokens']}"
+            )
+            if phase == "routing":
+                # Accepted: tool turns the routing model took instead of the configured model.
+                # Overhead: discarded routing calls that the configured model had to redo.
+                line += (
+                    f" accepted={stats['accepted']} accepted_tokens={stats['accepted_tokens']}"
+                    f" accepted_latency={stats['accepted_latency_s']:.2f}s"
+                    f" overhead_tokens={stats['overhead_tokens']} overhead_latency={stats['overhead_latency_s']:.2f}s"
+                    f" escalations={stats['escalations']} uncapped_retries={stats['uncapped_retries']}"
+                    # Saved: estimated cost with every turn on the configured model, minus the actual cost
+                    f" saved_tokens={stats['saved_tokens']:.0f} saved_latency={stats['saved_latency_s']:.2f}s"
+                )
+            lines.append(line)
+        return lines
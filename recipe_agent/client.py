@@ -1,41 +1,226 @@
-from typing import Any, Dict, List, Optional
+import json
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Optional
 
-import requests
-
-from recipe_agent.config import BASE_URL, DEFAULT_MODEL, TIMEOUT_SECONDS
+from recipe_agent import deadline, recorder
+from recipe_agent.config import (
+    BASE_URL,
+    DEFAULT_MODEL,
+    FALLBACK_MODELS,
+    HEDGE_ENABLED,
+    HEDGE_MAX_DELAY_SECONDS,
+    HEDGE_MIN_DELAY_SECONDS,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_MODEL,
+    MAX_RETRIES,
+    RETRY_BACKOFF_SECONDS,
+    RETRYABLE_STATUS_CODES,
+    TIMEOUT_SECONDS,
+)
 from recipe_agent.logging_utils import get_logger
 
 logger = get_logger(__name__)
 
+# Hedged requests run on a shared pool so the caller can wait on whichever finishes first
+_POOL_SIZE = 32
+_EXECUTOR = ThreadPoolExecutor(max_workers=_POOL_SIZE, thread_name_prefix="openrouter")
+# Free pool threads. Work is only submitted with a slot in hand, so attempts never queue
+# behind a busy pool (which would look like a slow upstream and trigger more hedges).
+_SLOTS = threading.BoundedSemaphore(_POOL_SIZE)
+
+# Recent successful latencies per model, used to derive the hedge delay
+_LATENCIES: Dict[str, Deque[float]] = {}
+_LATENCY_LOCK = threading.Lock()
+
+
+@recorder.replay_as_type
+class RetryableError(RuntimeError):
+    """Upstream failure worth retrying: timeouts, connection errors, 429 and 5xx."""
+
+
+def _record_latency(model: str, seconds: float) -> None:
+    with _LATENCY_LOCK:
+        _LATENCIES.setdefault(model, deque(maxlen=200)).append(seconds)
+
+
+def _submit(fn: Any, *args: Any) -> Optional[Future]:
+    """Run fn on the pool if a thread is free right now; None (nothing submitted) otherwise."""
+    if not _SLOTS.acquire(blocking=False):
+        return None
+
+    def run() -> Any:
+        try:
+            return fn(*args)
+        finally:
+            _SLOTS.release()
+
+    return _EXECUTOR.submit(run)
+
+
+def hedge_delay(model: str) -> float:
+    """p95 of recent latencies for model, clamped; the upper bound until enough samples exist."""
+    with _LATENCY_LOCK:
+        samples = sorted(_LATENCIES.get(model, ()))
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return HEDGE_MAX_DELAY_SECONDS
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return min(max(p95, HEDGE_MIN_DELAY_SECONDS), HEDGE_MAX_DELAY_SECONDS)
+
 
 class OpenRouterClient:
     def __init__(self, api_key: str, model: str = DEFAULT_MODEL):
         self.api_key = api_key
         self.model = model
+        # Token usage reported for the most recent chat() call
+        self.last_usage: Dict[str, Any] = {}
+        # One entry per HTTP attempt (retries, hedges, fallbacks) of the most recent chat() call
+        self.last_attempts: List[Dict[str, Any]] = []
+        # "stop", "tool_calls", "length" (cut off by max_tokens), ... for the most recent chat() call
+        self.last_finish_reason: Optional[str] = None
 
     def chat(
         self,
         messages: List[Dict[str, Any]],
         tools: Optional[List[Dict[str, Any]]] = None,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
     ) -> Dict[str, Any]:
 
         payload: Dict[str, Any] = {
-            "model": self.model,
+            "model": model or self.model,
             "messages": messages,
         }
+        if max_tokens:
+            payload["max_tokens"] = max_tokens
         if tools:
             payload["tools"] = tools
             # Let the model auto-select tools when provided
             payload["tool_choice"] = "auto"
 
+        request = {"model": payload["model"], "messages": messages, "tools": tools}
+        if max_tokens:
+            request["max_tokens"] = max_tokens
+        summary = {
+            "model": payload["model"],
+            "messages": len(messages),
+            "chars": len(json.dumps(messages, ensure_ascii=False, default=str)),
+            "tools": [tool.get("function", {}).get("name") for tool in tools or []],
+        }
+        result = recorder.call("openrouter.chat", request, lambda: self._chat_live(payload), summary=summary)
+        self.last_usage = result["usage"]
+        self.last_attempts = result["attempts"]
+        # Recordings made before finish_reason was kept don't have it
+        self.last_finish_reason = result.get("finish_reason")
+        return result["message"]
+
+    def _chat_live(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        attempts: List[Dict[str, Any]] = []
+        candidates = [payload["model"]] + [m for m in FALLBACK_MODELS if m != payload["model"]]
+
+        last_error: Optional[Exception] = None
+        for candidate in candidates:
+            candidate_payload = {**payload, "model": candidate}
+            for attempt in range(MAX_RETRIES + 1):
+                if attempt:
+                    backoff = RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                    time.sleep(deadline.timeout(backoff) or 0.0)
+                # Out of time: stop retrying instead of starting an attempt that cannot finish
+                deadline.check("OpenRouter chat")
+                try:
+                    data = self._hedged_post(candidate_payload, attempts)
+                except RetryableError as exc:
+                    last_error = exc
+                    logger.warning("OpenRouter attempt failed for %s: %s", candidate, exc)
+                    continue
+                except RuntimeError as exc:
+                    # Not retryable for this model (e.g. 400); a fallback model may still work
+                    last_error = exc
+                    break
+                return {
+                    "message": self._parse_message(data),
+                    "usage": data.get("usage") or {},
+                    "finish_reason": data["choices"][0].get("finish_reason"),
+                    "attempts": attempts,
+                }
+            if candidate != candidates[-1]:
+                logger.warning("Falling back from %s after: %s", candidate, last_error)
+
+        raise RuntimeError(str(last_error))
+
+    def _hedged_post(self, payload: Dict[str, Any], attempts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Send payload; if it hasn't answered within the hedge delay, send a duplicate
+        (optionally to HEDGE_MODEL) and return whichever succeeds first.
+        Raises DeadlineExceeded if the request deadline passes (or is cancelled) first.
+
+        Hedging needs two free pool threads. When the pool is busy (high load), the
+        attempt runs on the calling thread without a hedge rather than adding to the load.
+        """
+        # HTTP timeouts are capped to the request's remaining budget
+        timeout = deadline.timeout(TIMEOUT_SECONDS)
+        started = threading.Event()
+        primary = _submit(self._post, payload, attempts, False, timeout, started) if HEDGE_ENABLED else None
+        if primary is None:
+            return self._post(payload, attempts, False, timeout)
+
+        pending: set[Future] = {primary}
+        # The hedge delay counts from when the request is actually sent
+        started.wait(deadline.timeout(None))
+        done, _ = deadline.wait(pending, timeout=hedge_delay(payload["model"]))
+        if not done and not deadline.expired():
+            hedge_payload = {**payload, "model": HEDGE_MODEL or payload["model"]}
+            hedge = _submit(self._post, hedge_payload, attempts, True, deadline.timeout(TIMEOUT_SECONDS))
+            if hedge is not None:
+                logger.info("Hedging slow OpenRouter request for %s", payload["model"])
+                pending.add(hedge)
+
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = deadline.wait(pending)
+            if not done:
+                raise deadline.DeadlineExceeded("OpenRouter chat: deadline exceeded")
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    # The slower request keeps running in the background; its result is ignored
+                    return future.result()
+        raise error  # type: ignore[misc]
+
+    def _post(
+        self,
+        payload: Dict[str, Any],
+        attempts: List[Dict[str, Any]],
+        hedge: bool,
+        timeout: Optional[float] = TIMEOUT_SECONDS,
+        started: Optional[threading.Event] = None,
+    ) -> Dict[str, Any]:
+        if started is not None:
+            started.set()
+        # Deferred: requests costs ~70ms to import and most entrypoints never reach here
+        import requests
+
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
         }
+        record: Dict[str, Any] = {"model": payload["model"], "hedge": hedge}
+        attempts.append(record)
         logger.info("Calling OpenRouter chat completions API")
-        response = requests.post(
-            BASE_URL, headers=headers, json=payload, timeout=TIMEOUT_SECONDS
-        )
+        start = time.perf_counter()
+        try:
+            response = requests.post(
+                BASE_URL, headers=headers, json=payload, timeout=timeout
+            )
+        except requests.RequestException as exc:
+            record.update(latency_s=round(time.perf_counter() - start, 3), error=str(exc))
+            raise RetryableError(f"Request to OpenRouter failed: {exc}") from exc
+
+        elapsed = time.perf_counter() - start
+        record.update(latency_s=round(elapsed, 3), status=response.status_code)
         if not response.ok:
             message = "Failed to parse error response"
             payload_data: Optional[Dict[str, Any]] = None
@@ -44,14 +229,23 @@ class OpenRouterClient:
                 message = payload_data.get("error", {}).get("message", message)
             except ValueError:
                 message = response.text or message
-            raise RuntimeError(f"{response.status_code} {message}")
+            error_cls = RetryableError if response.status_code in RETRYABLE_STATUS_CODES else RuntimeError
+            raise error_cls(f"{response.status_code} {message}")
 
-        data = response.json()
+        try:
+            data = response.json()
+        except ValueError as exc:
+            # requests' JSONDecodeError is a ValueError; a truncated or HTML 200 is an upstream hiccup
+            raise RetryableError(f"Invalid JSON in OpenRouter response: {exc}") from exc
         # OpenAI / OpenRouter chat-completions style: choices[0].message
-        choices = data.get("choices") or []
-        if not choices:
-            raise RuntimeError("No choices returned from OpenRouter")
-        message = choices[0].get("message") or {}
+        if not isinstance(data, dict) or not data.get("choices"):
+            # OpenRouter reports some upstream failures as a 200 without choices
+            raise RetryableError("No choices returned from OpenRouter")
+        _record_latency(payload["model"], elapsed)
+        return data
+
+    def _parse_message(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        message = data["choices"][0].get("message") or {}
         # Normalise to at least have role/content keys
         return {
             "role": message.get("role", "assistant"),
@@ -11,10 +11,83 @@ SYSTEM_MESSAGES = [
             "1. 'search_local_recipes' for finding recipes in the database. "
             "2. 'calculate_recipe_nutrition' for precise nutrition facts. "
             "3. 'scale_recipe' for mathematical scaling of ingredients. "
+            "4. 'calculate_nutrition_batch' and 'scale_recipes_batch' when working with several recipes at once (meal plans, catering). "
             "For substitutions, allergen checks, and creative recipe ideas, rely on your own knowledge and reasoning. "
             "Do not call tools for substitutions or simple logic. "
             "If no tool is needed, answer directly. "
             "Format responses clearly with bullet points and steps."
         ),
     }
-]
\ No newline at end of file
+]
+
+# /responses/batch: worker pool size and upper bound on items per upload
+BATCH_MAX_CONCURRENCY = 8
+BATCH_MAX_ITEMS = 5000
+
+# Parallel USDA lookups when totalling nutrition for many recipes at once
+NUTRITION_LOOKUP_CONCURRENCY = 8
+
+# Per-process USDA lookup caches: least recently used entries are evicted past the cap.
+# A TTL (seconds) also drops entries that old; None keeps them until evicted.
+USDA_CACHE_MAX_SEARCHES = 20000  # ingredient name -> FDC ID
+USDA_CACHE_MAX_FOODS = 5000  # FDC ID -> nutrients and portion weights
+USDA_CACHE_TTL_SECONDS = None
+
+# Mongo circuit breaker: open after this many consecutive failures, probe again after the reset window
+MONGO_BREAKER_FAILURE_THRESHOLD = 3
+MONGO_BREAKER_RESET_SECONDS = 30
+
+# Logging: rotating file size/count, per-record message cap, queue bound and tool-trace sampling
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_MAX_PAYLOAD_CHARS = 4000
+LOG_QUEUE_SIZE = 10000
+LOG_TRACE_SAMPLE_RATE = 0.1
+
+# Speculative USDA prefetch for ingredients of recipes returned by search
+PREFETCH_ENABLED = True
+PREFETCH_WORKERS = 4
+PREFETCH_MAX_INGREDIENTS = 30  # per search call
+PREFETCH_MAX_PENDING = 200  # across all in-flight runs
+
+# Fast model for intermediate tool-selection turns; the client's model writes the final answer.
+# Set to None to use a single model for every turn.
+ROUTING_MODEL = "openai/gpt-4.1-mini"
+# Routing turns only pick tools: their output is capped, and when no tool is needed the routing
+# model is asked to reply with a one-word stop signal instead of writing an answer that is discarded.
+# Tool arguments cut off by the cap are invalid JSON, so that turn escalates to the configured model,
+# except for the batch tools below: their arguments restate whole recipes and can outgrow any fixed
+# cap, so a routing call cut off inside one is redone once on the routing model without the cap.
+ROUTING_MAX_TOKENS = 512
+ROUTING_UNCAPPED_TOOLS = ("calculate_nutrition_batch", "scale_recipes_batch")
+ROUTING_STOP_PROMPT = (
+    "Decide only whether more tool calls are needed. If they are, call the tools. "
+    "If not, reply with just the word DONE; the final answer will be written separately."
+)
+
+# Server-side conversation sessions (backend chosen with SESSION_BACKEND=memory|mongo)
+SESSION_TTL_SECONDS = 3600
+SESSION_MAX_SESSIONS = 10000  # in-memory store only
+SESSION_KEEP_TURNS = 2  # user turns whose tool outputs are kept in full
+SESSION_COMPACT_CHARS = 500  # older tool outputs are cut to this many characters
+
+# OpenRouter tail-latency control. After the hedge delay (p95 of recent latencies for the
+# model, clamped to the bounds below) a duplicate request goes to HEDGE_MODEL (None: same
+# model) and the first success wins. Retryable errors are retried with jittered backoff,
+# then FALLBACK_MODELS are tried in order.
+HEDGE_ENABLED = True
+HEDGE_MODEL = None
+HEDGE_MIN_DELAY_SECONDS = 2.0
+HEDGE_MAX_DELAY_SECONDS = 15.0
+HEDGE_MIN_SAMPLES = 20
+FALLBACK_MODELS: list[str] = []
+MAX_RETRIES = 2
+RETRY_BACKOFF_SECONDS = 0.5
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+# End-to-end budget for one /responses request or CLI run (override per request with
+# "deadline_seconds", up to the max). Downstream timeouts are capped to what is left. The last
+# DEADLINE_FINAL_ANSWER_SECONDS are reserved for the answer: tool turns stop when they reach it.
+REQUEST_DEADLINE_SECONDS = 120.0
+REQUEST_MAX_DEADLINE_SECONDS = 600.0
+DEADLINE_FINAL_ANSWER_SECONDS = 15.0
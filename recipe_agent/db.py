@@ -1,40 +1,331 @@
 import logging
 import re
+import threading
+import time
+from functools import lru_cache
 from typing import Any, Dict, List, Optional
 
 import pymongo
-from pymongo import MongoClient
+from pymongo import MongoClient, monitoring
+from pymongo.collection import Collection
+from pymongo.errors import PyMongoError
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+)
+from pymongo.write_concern import WriteConcern
 
-from recipe_agent.utils import get_mongo_config
+from recipe_agent import deadline, recorder
+from recipe_agent.config import MONGO_BREAKER_FAILURE_THRESHOLD, MONGO_BREAKER_RESET_SECONDS
+from recipe_agent.utils import get_mongo_config, get_mongo_pool_config, get_mongo_read_config
 
 logger = logging.getLogger(__name__)
 
+
+class CircuitBreaker:
+    """
+    Closed: calls go through. Open: calls are rejected immediately until
+    reset_seconds have passed. Half-open: one trial call decides whether to close again.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != "closed":
+                logger.info("MongoDB circuit breaker closed")
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning("MongoDB circuit breaker opened after %d failures", self.failures)
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def trip(self) -> None:
+        """Open now, regardless of the failure count."""
+        with self._lock:
+            if self.state != "open":
+                logger.warning("MongoDB circuit breaker opened")
+            self.failures = max(self.failures, 1)
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool counters collected from pymongo's CMAP events."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counters = {
+            "connections_created": 0,
+            "connections_closed": 0,
+            "checked_out": 0,
+            "checkouts": 0,
+            "checkout_failures": 0,
+            "pool_clears": 0,
+        }
+
+    def _add(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += amount
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self.counters)
+        stats["open_connections"] = stats["connections_created"] - stats["connections_closed"]
+        return stats
+
+    def pool_created(self, event: Any) -> None:
+        pass
+
+    def pool_ready(self, event: Any) -> None:
+        pass
+
+    def pool_cleared(self, event: Any) -> None:
+        self._add("pool_clears")
+
+    def pool_closed(self, event: Any) -> None:
+        pass
+
+    def connection_created(self, event: Any) -> None:
+        self._add("connections_created")
+
+    def connection_ready(self, event: Any) -> None:
+        pass
+
+    def connection_closed(self, event: Any) -> None:
+        self._add("connections_closed")
+
+    def connection_check_out_started(self, event: Any) -> None:
+        pass
+
+    def connection_check_out_failed(self, event: Any) -> None:
+        self._add("checkout_failures")
+
+    def connection_checked_out(self, event: Any) -> None:
+        self._add("checkouts")
+        self._add("checked_out")
+
+    def connection_checked_in(self, event: Any) -> None:
+        self._add("checked_out", -1)
+
+
+_READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+@lru_cache(maxsize=None)
+def search_read_preference() -> Any:
+    """Read preference for recipe searches, from MONGO_READ_PREFERENCE / MONGO_MAX_STALENESS_SECONDS (read once)."""
+    config = get_mongo_read_config()
+    if config["mode"] == "primary":
+        return Primary()
+    return _READ_PREFERENCES[config["mode"]](max_staleness=config["max_staleness_s"])
+
+
+def recipes_for_search(db: Any) -> Collection:
+    """The recipes collection as searches should read it (secondaries allowed when configured)."""
+    return db.get_collection("recipes", read_preference=search_read_preference())
+
+
+def recipes_for_writes(db: Any) -> Collection:
+    """
+    The recipes collection for imports and backfills: reads from the primary, and
+    majority write concern so bulk loads are paced by replication instead of
+    leaving secondaries too stale to serve searches.
+    """
+    return db.get_collection("recipes", read_preference=Primary(), write_concern=WriteConcern(w="majority"))
+
+
 _CLIENT: Optional[MongoClient] = None
+_CLIENT_LOCK = threading.Lock()
+_BREAKER = CircuitBreaker(MONGO_BREAKER_FAILURE_THRESHOLD, MONGO_BREAKER_RESET_SECONDS)
+_POOL_METRICS = PoolMetrics()
+_HEALTH_STOP = threading.Event()
+_HEALTH_THREAD: Optional[threading.Thread] = None
+# Invalid MONGO_READ_PREFERENCE / MONGO_MAX_STALENESS_SECONDS, found by check_config()
+_CONFIG_ERROR: Optional[str] = None
 
 
-def get_db() -> Any:
+def check_config() -> Optional[str]:
+    """Validate the search read settings; the error message if they are invalid (logged once), else None."""
+    global _CONFIG_ERROR
+    if _CONFIG_ERROR is None:
+        try:
+            search_read_preference()
+        except ValueError as e:
+            _CONFIG_ERROR = str(e)
+            logger.error(f"Invalid MongoDB read settings, not connecting: {e}")
+    return _CONFIG_ERROR
+
+
+def connect(startup: bool = False) -> bool:
+    """
+    Create the shared MongoClient and verify it with a ping. The client is only
+    published once the ping succeeds, so a failed attempt leaves nothing behind.
+    A failed ping at startup opens the circuit breaker right away, so searches don't
+    each wait out server selection until enough failures have been counted.
+    """
     global _CLIENT
-    uri, db_name = get_mongo_config()
-    if _CLIENT is None:
+    if check_config() is not None:
+        return False
+    with _CLIENT_LOCK:
+        if _CLIENT is not None:
+            return True
+
+        uri, _ = get_mongo_config()
+        pool = get_mongo_pool_config()
+        client: MongoClient = MongoClient(
+            uri,
+            maxPoolSize=pool["max_pool_size"],
+            minPoolSize=pool["min_pool_size"],
+            serverSelectionTimeoutMS=pool["server_selection_timeout_ms"],
+            connectTimeoutMS=pool["connect_timeout_ms"],
+            socketTimeoutMS=pool["socket_timeout_ms"],
+            event_listeners=[_POOL_METRICS],
+        )
         try:
-            _CLIENT = MongoClient(uri, serverSelectionTimeoutMS=2000)
-            _CLIENT.server_info()
+            # Ping a node searches can use, so an unreachable primary doesn't block secondary reads
+            client.admin.command("ping", read_preference=search_read_preference())
         except Exception as e:
+            client.close()
+            if startup:
+                _BREAKER.trip()
+            # A ping cut short by the request's deadline says nothing about the server's health
+            elif not (getattr(e, "timeout", False) and deadline.expired()):
+                _BREAKER.record_failure()
             logger.warning(f"Could not connect to MongoDB at {uri}: {e}")
-            return None
+            return False
+
+        _CLIENT = client
+        _BREAKER.record_success()
+        return True
+
+
+def get_db() -> Any:
+    """Database handle, or None when MongoDB is unreachable or the circuit breaker is open."""
+    if not _BREAKER.allow():
+        return None
+    if _CLIENT is None and not connect():
+        return None
+    _, db_name = get_mongo_config()
     return _CLIENT[db_name]
 
 
+def _health_check_loop(interval: float) -> None:
+    while not _HEALTH_STOP.wait(interval):
+        if _CLIENT is None:
+            connect()
+            continue
+        try:
+            _CLIENT.admin.command("ping", read_preference=search_read_preference())
+        except Exception as e:
+            logger.warning(f"MongoDB health check failed: {e}")
+            _BREAKER.record_failure()
+        else:
+            _BREAKER.record_success()
+
+
+def start_health_checks(interval: Optional[float] = None) -> None:
+    """Ping MongoDB in a background thread so the breaker state tracks the server, not live requests."""
+    global _HEALTH_THREAD
+    if _HEALTH_THREAD is not None and _HEALTH_THREAD.is_alive():
+        return
+    if interval is None:
+        interval = get_mongo_pool_config()["health_check_interval_s"]
+    _HEALTH_STOP.clear()
+    _HEALTH_THREAD = threading.Thread(
+        target=_health_check_loop, args=(interval,), name="mongo-health", daemon=True
+    )
+    _HEALTH_THREAD.start()
+
+
+def close() -> None:
+    global _CLIENT, _HEALTH_THREAD
+    _HEALTH_STOP.set()
+    if _HEALTH_THREAD is not None:
+        _HEALTH_THREAD.join(timeout=1)
+        _HEALTH_THREAD = None
+    with _CLIENT_LOCK:
+        if _CLIENT is not None:
+            _CLIENT.close()
+            _CLIENT = None
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Pool counters plus connection and circuit breaker state, for the /metrics endpoint."""
+    pool = get_mongo_pool_config()
+    config_error = check_config()
+    return {
+        "connected": _CLIENT is not None,
+        "search_read_preference": None if config_error else search_read_preference().document,
+        "config_error": config_error,
+        "breaker_state": _BREAKER.state,
+        "consecutive_failures": _BREAKER.failures,
+        "max_pool_size": pool["max_pool_size"],
+        "min_pool_size": pool["min_pool_size"],
+        **_POOL_METRICS.snapshot(),
+    }
+
+
 def search_recipes_mongo(
     query: str,
     cuisine: Optional[str] = None,
     diet: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    return recorder.call(
+        "mongo.search_recipes",
+        {"query": query, "cuisine": cuisine, "diet": diet},
+        lambda: _search_recipes(query, cuisine, diet),
+    )
+
+
+def _search_recipes(query: str, cuisine: Optional[str], diet: Optional[str]) -> List[Dict[str, Any]]:
+    if deadline.expired():
+        return []
+    # Server selection, connection checkout and the query all share the request's remaining time
+    with pymongo.timeout(deadline.remaining()):
+        return _search_recipes_within_deadline(query, cuisine, diet)
+
+
+def _search_recipes_within_deadline(
+    query: str,
+    cuisine: Optional[str],
+    diet: Optional[str],
 ) -> List[Dict[str, Any]]:
     db = get_db()
     if db is None:
         return []
 
-    collection = db.recipes
+    collection = recipes_for_search(db)
     conditions = []
 
     # Text search on title, ingredients, and instructions
@@ -72,5 +363,13 @@ def search_recipes_mongo(
     elif len(conditions) > 1:
         mongo_query = {"$and": conditions}
 
-    cursor = collection.find(mongo_query, {"_id": 0}).limit(5)
-    return list(cursor)
\ No newline at end of file
+    try:
+        results = list(collection.find(mongo_query, {"_id": 0}).limit(5))
+    except PyMongoError as e:
+        # Running out of request time says nothing about the server's health
+        if not (e.timeout and deadline.expired()):
+            _BREAKER.record_failure()
+        logger.warning(f"Recipe search failed: {e}")
+        return []
+    _BREAKER.record_success()
+    return results
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""
+Request-scoped deadlines.
+
+A Deadline is set for the duration of a request with `use()`. Code further down
+(LLM, USDA and Mongo calls) asks `timeout(default)` for its own timeout, which
+is the smaller of its usual limit and what is left of the request's budget. A
+deadline can also be cancelled, e.g. when the client disconnects, which makes it
+expire immediately.
+
+The deadline lives in a contextvar, so worker threads only see it when the task
+runs in a copy of the caller's context (`contextvars.copy_context().run`).
+"""
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait as futures_wait
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional, Set, Tuple
+
+_DEADLINE: contextvars.ContextVar[Optional["Deadline"]] = contextvars.ContextVar("recipe_agent_deadline", default=None)
+
+# How often waits on futures wake up to notice a cancelled deadline
+_POLL_SECONDS = 0.25
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's time budget ran out (or the request was cancelled) before the work finished."""
+
+
+class Deadline:
+    def __init__(self, seconds: Optional[float], parent: Optional["Deadline"] = None):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+        # Cancelling the parent (e.g. on disconnect) cancels this deadline too
+        self.parent = parent
+        self._cancelled = threading.Event()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, 0 once expired or cancelled, None for no limit."""
+        if self.cancelled:
+            return 0.0
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() == 0.0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set() or (self.parent is not None and self.parent.cancelled)
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+
+def current() -> Optional[Deadline]:
+    return _DEADLINE.get()
+
+
+@contextmanager
+def use(deadline: Optional[Deadline]) -> Iterator[Optional[Deadline]]:
+    """Make deadline the current one for this block. An outer deadline that ends sooner still wins."""
+    outer = _DEADLINE.get()
+    if deadline is not None and outer is not None:
+        outer_remaining, inner_remaining = outer.remaining(), deadline.remaining()
+        if inner_remaining is None or (outer_remaining is not None and outer_remaining < inner_remaining):
+            deadline = outer
+    token = _DEADLINE.set(deadline if deadline is not None else outer)
+    try:
+        yield _DEADLINE.get()
+    finally:
+        _DEADLINE.reset(token)
+
+
+@contextmanager
+def reserve(seconds: float) -> Iterator[Optional[Deadline]]:
+    """
+    Run the block under the current deadline minus `seconds`, keeping that much for
+    whatever runs after it. Without a current deadline the block has no limit either.
+    """
+    outer = _DEADLINE.get()
+    left = outer.remaining() if outer is not None else None
+    if left is None:
+        yield outer
+        return
+    with use(Deadline(max(0.0, left - seconds), parent=outer)) as inner:
+        yield inner
+
+
+def remaining() -> Optional[float]:
+    deadline = _DEADLINE.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def expired() -> bool:
+    deadline = _DEADLINE.get()
+    return deadline is not None and deadline.expired()
+
+
+def timeout(default: Optional[float]) -> Optional[float]:
+    """default, capped to the time left on the current deadline (None means no limit)."""
+    left = remaining()
+    if left is None:
+        return default
+    return left if default is None else min(default, left)
+
+
+def check(what: str = "request") -> None:
+    deadline = _DEADLINE.get()
+    if deadline is not None and deadline.expired():
+        reason = "cancelled" if deadline.cancelled else "deadline exceeded"
+        raise DeadlineExceeded(f"{what}: {reason}")
+
+
+def wait(
+    futures: Iterable[Future],
+    timeout: Optional[float] = None,
+    return_when: str = FIRST_COMPLETED,
+) -> Tuple[Set[Future], Set[Future]]:
+    """
+    concurrent.futures.wait that also returns early (possibly with nothing done)
+    when the current deadline expires or is cancelled.
+    """
+    pending = set(futures)
+    finished: Set[Future] = set()
+    stop_at = time.monotonic() + timeout if timeout is not None else None
+    while True:
+        step = _POLL_SECONDS
+        left = remaining()
+        if left is not None:
+            step = min(step, left)
+        if stop_at is not None:
+            step = min(step, max(0.0, stop_at - time.monotonic()))
+        done, pending = futures_wait(pending, timeout=step, return_when=return_when)
+        finished |= done
+        if not pending or (done and return_when == FIRST_COMPLETED):
+            return finished, pending
+        if expired() or (stop_at is not None and time.monotonic() >= stop_at):
+            return finished, pending
@@ -1,27 +1,161 @@
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import random
+import threading
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, Optional
 
+from recipe_agent.config import (
+    LOG_BACKUP_COUNT,
+    LOG_MAX_BYTES,
+    LOG_MAX_PAYLOAD_CHARS,
+    LOG_QUEUE_SIZE,
+)
+
+# Attributes every LogRecord has; anything else was passed via `extra=` and goes into JSON output
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_LISTENER: Optional[logging.handlers.QueueListener] = None
+_QUEUE_HANDLER: Optional["DroppingQueueHandler"] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any `extra=` fields as top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and key != "sample_rate":
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of records logged with `extra={"sample_rate": rate}`."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, "sample_rate", None)
+        return rate is None or random.random() < rate
+
+
+class PayloadLimitFilter(logging.Filter):
+    """Truncate rendered messages over max_chars so large payloads don't reach the writers."""
+
+    def __init__(self, max_chars: int):
+        super().__init__()
+        self.max_chars = max_chars
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        message = record.getMessage()
+        if len(message) > self.max_chars:
+            record.msg = f"{message[:self.max_chars]}... [truncated {len(message) - self.max_chars} chars]"
+            record.args = None
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of blocking the caller."""
+
+    def __init__(self, queue: "queue.Queue[logging.LogRecord]"):
+        super().__init__(queue)
+        self._dropped_lock = threading.Lock()
+        # Records dropped by this handler; many request threads can hit a full queue at once
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Render the message now (its args may change after the call returns) but, unlike
+        QueueHandler.prepare, keep exc_info/exc_text: the listener's formatters render the
+        traceback themselves, so JsonFormatter can put it in its own "exc" field.
+        """
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+def setup_logging(
+    log_dir: str = "logs",
+    log_level: str = "INFO",
+    log_file: str = "recipe_agent.log",
+    max_bytes: int = LOG_MAX_BYTES,
+    backup_count: int = LOG_BACKUP_COUNT,
+    max_payload_chars: int = LOG_MAX_PAYLOAD_CHARS,
+) -> None:
+    """
+    Configure logging to a rotating JSON file + stdout. Callers only enqueue records;
+    a background listener thread does the formatting and I/O.
+    """
+    global _LISTENER, _QUEUE_HANDLER
+    shutdown_logging()
 
-def setup_logging(log_dir: str = "logs", log_level: str = "INFO", log_file: str = "recipe_agent.log") -> None:
-    """Configure basic logging to file + stdout."""
     Path(log_dir).mkdir(parents=True, exist_ok=True)
     log_path = Path(log_dir) / log_file
 
     level = getattr(logging, log_level.upper(), logging.INFO)
 
-    handlers: list[logging.Handler] = [
-        logging.FileHandler(log_path, encoding="utf-8"),
-        logging.StreamHandler(),
-    ]
-
-    logging.basicConfig(
-        level=level,
-        format="%(asctime)s | %(name)s | %(levelname)s | %(message)s",
-        handlers=handlers,
-        force=True,
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
     )
+    file_handler.setFormatter(JsonFormatter())
+    stream_handler = logging.StreamHandler()
+    if os.getenv("LOG_FORMAT", "").lower() == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(
+            logging.Formatter("%(asctime)s | %(name)s | %(levelname)s | %(message)s")
+        )
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    # The queue side only renders the message; the listener's handlers format the record and any traceback
+    queue_handler = DroppingQueueHandler(log_queue)
+    # Sample first so dropped records are never rendered, then cap what is left
+    queue_handler.addFilter(SamplingFilter())
+    queue_handler.addFilter(PayloadLimitFilter(max_payload_chars))
+
+    logging.basicConfig(level=level, handlers=[queue_handler], force=True)
+    _QUEUE_HANDLER = queue_handler
+
+    _LISTENER = logging.handlers.QueueListener(log_queue, file_handler, stream_handler)
+    _LISTENER.start()
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _LISTENER
+    if _LISTENER is not None:
+        _LISTENER.stop()
+        for handler in _LISTENER.handlers:
+            handler.close()
+        _LISTENER = None
+
+
+atexit.register(shutdown_logging)
+
+
+def dropped_records() -> int:
+    """Records dropped because the log queue was full, since logging was last set up."""
+    return _QUEUE_HANDLER.dropped if _QUEUE_HANDLER is not None else 0
 
 
 def get_logger(name: Optional[str] = None) -> logging.Logger:
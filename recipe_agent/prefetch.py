@@ -0,0 +1,153 @@
+import contextvars
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from recipe_agent import usda
+from recipe_agent.config import (
+    PREFETCH_ENABLED,
+    PREFETCH_MAX_INGREDIENTS,
+    PREFETCH_MAX_PENDING,
+    PREFETCH_WORKERS,
+    USDA_CACHE_MAX_SEARCHES,
+    USDA_CACHE_TTL_SECONDS,
+)
+from recipe_agent.logging_utils import get_logger
+from recipe_agent.units import leading_unit, split_quantity
+from recipe_agent.utils import normalize_ingredient_name
+
+logger = get_logger(__name__)
+
+# Preparation words that never help a USDA search ("finely chopped onion" -> "onion")
+_PREP_WORDS = {
+    "chopped", "diced", "minced", "sliced", "grated", "shredded", "crushed",
+    "fresh", "freshly", "finely", "coarsely", "thinly", "firmly", "lightly", "packed",
+    "softened", "melted", "beaten", "cooked", "drained", "peeled", "halved", "cubed",
+    "large", "medium", "small", "whole", "frozen", "thawed", "about", "of",
+}
+_PARENS_RE = re.compile(r"\([^)]*\)")
+
+# Reentrant: a done-callback can run inline, under the lock, when a future finishes immediately
+_LOCK = threading.RLock()
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+# Prefetches still queued or running, keyed by the thread that scheduled them
+_PENDING: Dict[int, List[Tuple[Future, threading.Event]]] = {}
+# Names prefetched but not yet asked for by a nutrition tool call (value unused). Bounded like
+# the USDA search cache it mirrors, so names that are never asked for don't pile up.
+_PREFETCHED = usda._LruCache(USDA_CACHE_MAX_SEARCHES, USDA_CACHE_TTL_SECONDS)
+_STATS = {"scheduled": 0, "skipped": 0, "completed": 0, "cancelled": 0, "used": 0}
+
+
+def ingredient_name(line: str) -> str:
+    """Reduce a recipe ingredient line to a searchable food name: "1 c. firmly packed brown sugar" -> "brown sugar"."""
+    text = _PARENS_RE.sub(" ", line).split(",")[0]
+    _, text = split_quantity(text)
+    _, text = leading_unit(text)
+    words = [word for word in text.split() if word.lower().strip(".") not in _PREP_WORDS]
+    return normalize_ingredient_name(" ".join(words))
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+    return _EXECUTOR
+
+
+def _prefetch_one(name: str, cancelled: threading.Event) -> None:
+    if cancelled.is_set():
+        return
+    fdc_id = usda.search_food(name)
+    if not fdc_id or cancelled.is_set():
+        return
+    if usda.get_food(fdc_id):
+        with _LOCK:
+            _PREFETCHED.put(name, True)
+            _STATS["completed"] += 1
+
+
+def schedule_recipes(recipes: Iterable[Dict[str, Any]]) -> int:
+    """
+    Start warming the USDA cache for the ingredients of search results, in the
+    background, while the model decides what to do next. Returns how many
+    lookups were scheduled; anything over the per-call or global budget is skipped.
+    """
+    if not PREFETCH_ENABLED or not usda.get_api_key():
+        return 0
+
+    names: List[str] = []
+    for recipe in recipes:
+        for line in recipe.get("ingredients") or []:
+            name = ingredient_name(str(line))
+            if name and name not in names:
+                names.append(name)
+
+    owner = threading.get_ident()
+    scheduled = 0
+    with _LOCK:
+        pending = sum(len(entries) for entries in _PENDING.values())
+        budget = max(0, min(PREFETCH_MAX_INGREDIENTS, PREFETCH_MAX_PENDING - pending))
+        cancelled = threading.Event()
+        for name in names:
+            if _PREFETCHED.get(name)[0]:
+                continue
+            if scheduled >= budget:
+                _STATS["skipped"] += 1
+                continue
+            # In an empty context: the result may serve any later run, so the lookup is neither cut
+            # short by this run's deadline nor recorded as one of this run's calls
+            future = _executor().submit(contextvars.Context().run, _prefetch_one, name, cancelled)
+            _PENDING.setdefault(owner, []).append((future, cancelled))
+            future.add_done_callback(lambda f, owner=owner: _forget(owner, f))
+            scheduled += 1
+        _STATS["scheduled"] += scheduled
+
+    if scheduled:
+        logger.info("Prefetching nutrition for %d ingredients", scheduled)
+    return scheduled
+
+
+def _forget(owner: int, future: Future) -> None:
+    with _LOCK:
+        entries = _PENDING.get(owner)
+        if not entries:
+            return
+        entries[:] = [entry for entry in entries if entry[0] is not future]
+        if not entries:
+            del _PENDING[owner]
+
+
+def cancel_pending() -> int:
+    """
+    Cancel prefetches scheduled from the current thread (call when its agent run ends).
+    Queued prefetches never start. Running ones are not interrupted: a USDA request in
+    flight still completes and fills the cache, and only the follow-up lookup is skipped.
+    """
+    with _LOCK:
+        entries = list(_PENDING.get(threading.get_ident(), []))
+    cancelled = 0
+    for future, event in entries:
+        event.set()
+        if future.cancel():
+            cancelled += 1
+    if cancelled:
+        with _LOCK:
+            _STATS["cancelled"] += cancelled
+    return cancelled
+
+
+def note_lookup(name: str) -> None:
+    """Record that a nutrition tool asked for `name`, counting it as used if it was prefetched."""
+    key = normalize_ingredient_name(name)
+    with _LOCK:
+        if _PREFETCHED.discard(key):
+            _STATS["used"] += 1
+
+
+def get_stats() -> Dict[str, Any]:
+    with _LOCK:
+        stats: Dict[str, Any] = dict(_STATS)
+        stats["pending"] = sum(len(entries) for entries in _PENDING.values())
+    stats["hit_rate"] = round(stats["used"] / stats["completed"], 3) if stats["completed"] else 0.0
+    return stats
@@ -0,0 +1,300 @@
+"""
+Opt-in record/replay of external calls (OpenRouter, USDA, MongoDB search).
+
+Recording appends one compact JSON line per call and one per agent run:
+
+    {"type": "call", "kind": "usda.search", "run_id": ..., "key": ..., "request": ...,
+     "response": ..., "duration_s": ...}
+    {"type": "run", "run_id": ..., "input": {...}, "reply": ..., "duration_s": ...}
+
+Replay serves each call from the recording instead of the network. Calls are
+matched by kind and a hash of the request (preferring the run being replayed),
+so a run re-executes deterministically as long as the local code makes the same
+requests. Latency is either the recorded one or zero. A call that failed carries
+`error` and `error_type` instead of a response. On replay, DeadlineExceeded and
+types marked with `replay_as_type` are re-raised as themselves, and anything else
+as RecordedError.
+
+Records are written and flushed by a background thread, so recording adds no
+file I/O to the calls being recorded.
+"""
+import atexit
+import contextvars
+import gzip
+import hashlib
+import json
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Type, TypeVar
+
+from recipe_agent.deadline import DeadlineExceeded
+from recipe_agent.logging_utils import get_logger
+from recipe_agent.utils import get_recorder_config
+
+logger = get_logger(__name__)
+
+# Run being recorded or replayed. Worker threads only see it when their task runs in a copy of the
+# caller's context (contextvars.copy_context().run); calls without one match by key only
+_RUN_ID: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("recipe_agent_run_id", default=None)
+
+
+class ReplayMissError(LookupError):
+    """A call was made during replay that the recording has no response for."""
+
+
+class RecordedError(RuntimeError):
+    """Re-raised during replay for a call that failed when it was recorded."""
+
+
+E = TypeVar("E", bound=Type[Exception])
+
+# Errors callers handle by type, re-raised as themselves on replay; anything else becomes RecordedError
+_REPLAYED_ERRORS: Dict[str, Type[Exception]] = {"DeadlineExceeded": DeadlineExceeded}
+
+
+def replay_as_type(cls: E) -> E:
+    """Class decorator: replay recorded failures of this exception type as the type itself."""
+    _REPLAYED_ERRORS[cls.__name__] = cls
+    return cls
+
+
+def _open(path: str, mode: str) -> IO[str]:
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")  # type: ignore[return-value]
+    return open(path, mode, encoding="utf-8")
+
+
+def _dumps(value: Any, **kwargs: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str, **kwargs)
+
+
+def request_key(kind: str, request: Any) -> str:
+    return hashlib.sha1(f"{kind}:{_dumps(request, sort_keys=True)}".encode("utf-8")).hexdigest()
+
+
+def load_records(path: str) -> List[Dict[str, Any]]:
+    with _open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class Recorder:
+    def __init__(
+        self,
+        record_path: Optional[str] = None,
+        replay_path: Optional[str] = None,
+        replay_latency: str = "real",
+    ):
+        self.record_path = record_path
+        self.replay_latency = replay_latency
+        self._lock = threading.Lock()
+        self._out: Optional[IO[str]] = None
+        # Serialized lines for the writer thread; None tells it to stop
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        # (kind, key) -> recorded calls, oldest first
+        self._replay: Optional[Dict[tuple, List[Dict[str, Any]]]] = None
+        self.stats = {"recorded": 0, "replayed": 0, "misses": 0}
+        if replay_path:
+            self._replay = {}
+            for record in load_records(replay_path):
+                if record.get("type") == "call":
+                    self._replay.setdefault((record["kind"], record["key"]), []).append(record)
+
+    @property
+    def recording(self) -> bool:
+        return self.record_path is not None
+
+    @property
+    def replaying(self) -> bool:
+        return self._replay is not None
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        # Serialized on the caller's thread, so the record can't change after the call returns
+        line = _dumps(record) + "\n"
+        writer = self._writer
+        # A forked worker inherits the object but not the thread
+        if writer is None or not writer.is_alive():
+            with self._lock:
+                if self._writer is None or not self._writer.is_alive():
+                    self._writer = threading.Thread(target=self._write_lines, name="recorder-writer", daemon=True)
+                    self._writer.start()
+        self._queue.put(line)
+
+    def _write_lines(self) -> None:
+        while True:
+            line = self._queue.get()
+            if line is None:
+                return
+            try:
+                if self._out is None:
+                    self._out = _open(self.record_path, "a")  # type: ignore[arg-type]
+                self._out.write(line)
+                self.stats["recorded"] += 1
+                # One flush per burst of records instead of one per record
+                if self._queue.empty():
+                    self._out.flush()
+            except Exception:
+                logger.exception("Could not write to recording %s", self.record_path)
+
+    def close(self) -> None:
+        """Write out everything queued so far and close the file."""
+        with self._lock:
+            writer, self._writer = self._writer, None
+            if writer is not None and writer.is_alive():
+                self._queue.put(None)
+                writer.join()
+            if self._out is not None:
+                self._out.close()
+                self._out = None
+
+    def call(
+        self,
+        kind: str,
+        request: Dict[str, Any],
+        fn: Callable[[], Any],
+        summary: Optional[Dict[str, Any]] = None,
+    ) -> Any:
+        """
+        Run fn (the live call) and record it, or answer from the recording when replaying.
+        `summary` replaces the request in the file for large requests (it is still hashed in full).
+        """
+        if not self.recording and not self.replaying:
+            return fn()
+        key = request_key(kind, request)
+        if self.replaying:
+            return self._replay_call(kind, key)
+
+        start = time.perf_counter()
+        record: Dict[str, Any] = {
+            "type": "call",
+            "kind": kind,
+            "run_id": _RUN_ID.get(),
+            "key": key,
+            "request": summary if summary is not None else request,
+        }
+        try:
+            response = fn()
+        except Exception as exc:
+            record.update(
+                duration_s=round(time.perf_counter() - start, 4),
+                error=f"{type(exc).__name__}: {exc}",
+                error_type=type(exc).__name__,
+            )
+            self._write(record)
+            raise
+        record.update(duration_s=round(time.perf_counter() - start, 4), response=response)
+        self._write(record)
+        return response
+
+    def _replay_call(self, kind: str, key: str) -> Any:
+        run_id = _RUN_ID.get()
+        with self._lock:
+            candidates = self._replay.get((kind, key)) if self._replay is not None else None
+            if not candidates:
+                self.stats["misses"] += 1
+                raise ReplayMissError(f"No recorded {kind} call for request {key[:12]}")
+            index = next((i for i, c in enumerate(candidates) if c.get("run_id") == run_id), 0)
+            # The last recorded response for a key is kept so repeats (e.g. cold vs warm caches) still match
+            record = candidates.pop(index) if len(candidates) > 1 else candidates[0]
+            self.stats["replayed"] += 1
+
+        if self.replay_latency == "real" and record.get("duration_s"):
+            time.sleep(record["duration_s"])
+        if "error" in record:
+            error_cls = _REPLAYED_ERRORS.get(record.get("error_type", ""))
+            if error_cls is not None:
+                raise error_cls(record["error"].split(": ", 1)[-1])
+            raise RecordedError(record["error"])
+        return record.get("response")
+
+    @contextmanager
+    def run(self, inputs: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Scope an agent run: calls inside it carry its run_id, and when recording a
+        run record with the inputs (enough to replay it) and reply is written at the end.
+        Callers put the reply into the yielded dict.
+        """
+        outputs: Dict[str, Any] = {}
+        if not self.recording:
+            yield outputs
+            return
+
+        run_id = _RUN_ID.get() or uuid.uuid4().hex
+        token = _RUN_ID.set(run_id)
+        start = time.perf_counter()
+        error: Optional[str] = None
+        try:
+            yield outputs
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            raise
+        finally:
+            _RUN_ID.reset(token)
+            record = {
+                "type": "run",
+                "run_id": run_id,
+                "input": inputs,
+                "duration_s": round(time.perf_counter() - start, 4),
+                **outputs,
+            }
+            if error:
+                record["error"] = error
+            self._write(record)
+
+
+@contextmanager
+def run_id(value: Optional[str]) -> Iterator[None]:
+    """Attribute calls made in this block to run `value` (used when replaying a recorded run)."""
+    token = _RUN_ID.set(value)
+    try:
+        yield
+    finally:
+        _RUN_ID.reset(token)
+
+
+_RECORDER: Optional[Recorder] = None
+_RECORDER_LOCK = threading.Lock()
+
+
+def get_recorder() -> Recorder:
+    """Process-wide recorder configured from RECIPE_AGENT_RECORD / RECIPE_AGENT_REPLAY."""
+    global _RECORDER
+    with _RECORDER_LOCK:
+        if _RECORDER is None:
+            config = get_recorder_config()
+            _RECORDER = Recorder(**config)
+            if _RECORDER.recording:
+                logger.info("Recording external calls to %s", config["record_path"])
+            if _RECORDER.replaying:
+                logger.info("Replaying external calls from %s", config["replay_path"])
+        return _RECORDER
+
+
+def configure(
+    record_path: Optional[str] = None,
+    replay_path: Optional[str] = None,
+    replay_latency: str = "real",
+) -> Recorder:
+    """Replace the process-wide recorder (e.g. from the replay script) instead of using the environment."""
+    global _RECORDER
+    with _RECORDER_LOCK:
+        if _RECORDER is not None:
+            _RECORDER.close()
+        _RECORDER = Recorder(record_path, replay_path, replay_latency)
+        return _RECORDER
+
+
+def _close() -> None:
+    if _RECORDER is not None:
+        _RECORDER.close()
+
+
+# Gzipped recordings are only readable once the stream is closed
+atexit.register(_close)
+
+
+def call(kind: str, request: Dict[str, Any], fn: Callable[[], Any], summary: Optional[Dict[str, Any]] = None) -> Any:
+    return get_recorder().call(kind, request, fn, summary)
@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from recipe_agent.config import (
+    SESSION_COMPACT_CHARS,
+    SESSION_KEEP_TURNS,
+    SESSION_MAX_SESSIONS,
+    SESSION_TTL_SECONDS,
+)
+from recipe_agent.logging_utils import get_logger
+from recipe_agent.utils import get_session_backend
+
+logger = get_logger(__name__)
+
+Messages = List[Dict[str, Any]]
+
+
+class SessionStoreUnavailable(RuntimeError):
+    """The session backend could not be reached, so a session could not be read or saved."""
+
+
+def compact_messages(
+    messages: Messages,
+    keep_turns: int = SESSION_KEEP_TURNS,
+    max_chars: int = SESSION_COMPACT_CHARS,
+) -> Messages:
+    """
+    Shorten tool outputs older than the last `keep_turns` user turns. Recent tool
+    results stay intact so the model can reuse them; old ones keep only a prefix.
+    """
+    user_indexes = [i for i, msg in enumerate(messages) if msg.get("role") == "user"]
+    if len(user_indexes) <= keep_turns:
+        return list(messages)
+    cutoff = user_indexes[-keep_turns] if keep_turns else len(messages)
+
+    compacted = []
+    for i, msg in enumerate(messages):
+        content = msg.get("content")
+        if i < cutoff and msg.get("role") == "tool" and isinstance(content, str) and len(content) > max_chars:
+            msg = {**msg, "content": f"{content[:max_chars]}... [compacted]"}
+        compacted.append(msg)
+    return compacted
+
+
+class InMemorySessionStore:
+    """Per-process session store with TTL expiry and an LRU cap on the number of sessions."""
+
+    def __init__(self, ttl_seconds: int = SESSION_TTL_SECONDS, max_sessions: int = SESSION_MAX_SESSIONS):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Tuple[float, Messages]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Messages]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            expires_at, messages = entry
+            if expires_at <= time.monotonic():
+                del self._sessions[session_id]
+                return None
+            self._sessions.move_to_end(session_id)
+            return list(messages)
+
+    def save(self, session_id: str, messages: Messages) -> None:
+        with self._lock:
+            self._sessions[session_id] = (time.monotonic() + self.ttl_seconds, compact_messages(messages))
+            self._sessions.move_to_end(session_id)
+            self._evict()
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        for session_id in [sid for sid, (expires_at, _) in self._sessions.items() if expires_at <= now]:
+            del self._sessions[session_id]
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class MongoSessionStore:
+    """Sessions in the `sessions` collection, shared by all workers; a TTL index removes expired ones."""
+
+    def __init__(self, ttl_seconds: int = SESSION_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._index_ready = False
+
+    def _collection(self) -> Any:
+        from recipe_agent.db import get_db
+
+        db = get_db()
+        if db is None:
+            raise SessionStoreUnavailable("MongoDB is unavailable")
+        collection = db.sessions
+        if not self._index_ready:
+            collection.create_index("expires_at", expireAfterSeconds=0)
+            self._index_ready = True
+        return collection
+
+    # Unlike recipe search, a missing session can't be papered over with an empty result:
+    # failures raise SessionStoreUnavailable so callers can tell them apart from "no such session".
+    def get(self, session_id: str) -> Optional[Messages]:
+        from pymongo.errors import PyMongoError
+
+        try:
+            doc = self._collection().find_one(
+                {"_id": session_id, "expires_at": {"$gt": datetime.now(timezone.utc)}}
+            )
+        except PyMongoError as exc:
+            raise SessionStoreUnavailable(f"Could not load session: {exc}") from exc
+        return doc["messages"] if doc else None
+
+    def save(self, session_id: str, messages: Messages) -> None:
+        from pymongo.errors import PyMongoError
+
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+        try:
+            self._collection().replace_one(
+                {"_id": session_id},
+                {"_id": session_id, "messages": compact_messages(messages), "expires_at": expires_at},
+                upsert=True,
+            )
+        except PyMongoError as exc:
+            raise SessionStoreUnavailable(f"Could not save session: {exc}") from exc
+
+    def delete(self, session_id: str) -> None:
+        from pymongo.errors import PyMongoError
+
+        try:
+            self._collection().delete_one({"_id": session_id})
+        except PyMongoError as exc:
+            raise SessionStoreUnavailable(f"Could not delete session: {exc}") from exc
+
+
+_STORE: Optional[Any] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_session_store() -> Any:
+    """The process-wide store selected by SESSION_BACKEND ("memory" or "mongo")."""
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            backend = get_session_backend()
+            _STORE = MongoSessionStore() if backend == "mongo" else InMemorySessionStore()
+            logger.info("Using %s session store", type(_STORE).__name__)
+        return _STORE
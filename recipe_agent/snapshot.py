@@ -0,0 +1,247 @@
+"""
+Read-only recipe store in a single memory-mapped file.
+
+Layout: an 8-byte magic, a uint32 header length, a JSON header, then 8-byte
+aligned sections:
+
+- record_offsets  uint64[count + 1]  byte offsets into `records`
+- records         concatenated JSON documents, one per recipe
+- vocab           b"\\n" + sorted lowercase tokens joined by b"\\n" + b"\\n"
+- token_starts    uint64[vocab_size]  offset of each token inside `vocab`
+- posting_offsets uint64[vocab_size + 1]  offsets into `postings`
+- postings        uint32[]  record ids per token, ascending
+
+Readers map the file read-only and slice it through memoryviews, so worker
+processes share one copy in the page cache and only matching records are decoded.
+"""
+import bisect
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from recipe_agent.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+MAGIC = b"RCPSNAP1"
+VERSION = 1
+_HEADER_LEN = struct.Struct("<I")
+_TOKEN_RE = re.compile(r"\w+")
+_REGEX_META = set(".^$*+?{}[]|()\\")
+
+
+def _tokens(recipe: Dict[str, Any]) -> Set[str]:
+    fields = [recipe.get("title") or "", recipe.get("instructions") or "", *(recipe.get("ingredients") or [])]
+    return {token for field in fields for token in _TOKEN_RE.findall(str(field).lower())}
+
+
+def _pad(out: Any, position: int) -> int:
+    padding = -position % 8
+    out.write(b"\0" * padding)
+    return position + padding
+
+
+def write_snapshot(path: str, recipes: Iterable[Dict[str, Any]]) -> int:
+    """Write recipes (title / ingredients / instructions dicts) to a snapshot file. Returns the count."""
+    record_offsets = array("Q", [0])
+    records = bytearray()
+    postings_by_token: Dict[str, array] = {}
+
+    for record_id, recipe in enumerate(recipes):
+        records += json.dumps(recipe, ensure_ascii=False).encode("utf-8")
+        record_offsets.append(len(records))
+        for token in _tokens(recipe):
+            postings_by_token.setdefault(token, array("I")).append(record_id)
+
+    vocab_tokens = sorted(postings_by_token)
+    vocab = bytearray(b"\n")
+    token_starts = array("Q")
+    posting_offsets = array("Q", [0])
+    postings = array("I")
+    for token in vocab_tokens:
+        token_starts.append(len(vocab))
+        vocab += token.encode("utf-8") + b"\n"
+        postings.extend(postings_by_token[token])
+        posting_offsets.append(len(postings))
+
+    sections = [
+        ("record_offsets", record_offsets.tobytes()),
+        ("records", bytes(records)),
+        ("vocab", bytes(vocab)),
+        ("token_starts", token_starts.tobytes()),
+        ("posting_offsets", posting_offsets.tobytes()),
+        ("postings", postings.tobytes()),
+    ]
+
+    # Section offsets depend on the header length, so lay out with a fixed-width header
+    header: Dict[str, Any] = {
+        "version": VERSION,
+        "byteorder": sys.byteorder,
+        "count": len(record_offsets) - 1,
+        "vocab_size": len(vocab_tokens),
+        "sections": {},
+    }
+    header_size = len(json.dumps({**header, "sections": {name: [2**63, 2**63] for name, _ in sections}})) + 64
+    position = len(MAGIC) + _HEADER_LEN.size + header_size
+    position += -position % 8
+    for name, data in sections:
+        header["sections"][name] = [position, len(data)]
+        position += len(data)
+        position += -position % 8
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as out:
+        header_bytes = json.dumps(header).encode("utf-8").ljust(header_size)
+        out.write(MAGIC + _HEADER_LEN.pack(header_size) + header_bytes)
+        written = _pad(out, len(MAGIC) + _HEADER_LEN.size + header_size)
+        for _, data in sections:
+            out.write(data)
+            written = _pad(out, written + len(data))
+    # Atomic swap: processes that already mapped the old file keep reading it
+    os.replace(tmp_path, path)
+    logger.info("Wrote snapshot of %d recipes (%d tokens) to %s", header["count"], header["vocab_size"], path)
+    return header["count"]
+
+
+class RecipeSnapshot:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} is not a recipe snapshot")
+        (header_size,) = _HEADER_LEN.unpack_from(self._mm, len(MAGIC))
+        start = len(MAGIC) + _HEADER_LEN.size
+        header = json.loads(bytes(self._mm[start:start + header_size]))
+        if header.get("version") != VERSION or header.get("byteorder") != sys.byteorder:
+            self._mm.close()
+            raise ValueError(f"{path}: unsupported snapshot version or byte order")
+
+        self.count: int = header["count"]
+        self.vocab_size: int = header["vocab_size"]
+        self._view = memoryview(self._mm)
+        sections = header["sections"]
+
+        def section(name: str, fmt: Optional[str] = None) -> memoryview:
+            offset, length = sections[name]
+            view = self._view[offset:offset + length]
+            return view.cast(fmt) if fmt else view
+
+        self._record_offsets = section("record_offsets", "Q")
+        self._records = section("records")
+        self._vocab_range = (sections["vocab"][0], sections["vocab"][0] + sections["vocab"][1])
+        self._token_starts = section("token_starts", "Q")
+        self._posting_offsets = section("posting_offsets", "Q")
+        self._postings = section("postings", "I")
+
+    def close(self) -> None:
+        for view in (self._record_offsets, self._records, self._token_starts, self._posting_offsets, self._postings):
+            view.release()
+        self._view.release()
+        self._mm.close()
+
+    def record(self, record_id: int) -> Dict[str, Any]:
+        start, end = self._record_offsets[record_id], self._record_offsets[record_id + 1]
+        return json.loads(bytes(self._records[start:end]))
+
+    def _word_postings(self, word: str) -> Set[int]:
+        """Ids of records containing a token that has `word` as a substring."""
+        vocab_start, vocab_end = self._vocab_range
+        ids: Set[int] = set()
+        seen: Set[int] = set()
+        pattern = re.compile(re.escape(word.encode("utf-8")))
+        for match in pattern.finditer(self._mm, vocab_start, vocab_end):
+            token_index = bisect.bisect_right(self._token_starts, match.start() - vocab_start) - 1
+            if token_index < 0 or token_index in seen:
+                continue
+            seen.add(token_index)
+            lo, hi = self._posting_offsets[token_index], self._posting_offsets[token_index + 1]
+            ids.update(self._postings[lo:hi])
+        return ids
+
+    def _candidates(self, term: str) -> Optional[Set[int]]:
+        """Superset of records that can match term, from the token index; None when it can't narrow."""
+        words = _TOKEN_RE.findall(term.lower())
+        if not words or any(ch in _REGEX_META for ch in term):
+            # Regex syntax (".", "|", ...) can match text whose tokens don't contain the words
+            return None
+        candidates: Optional[Set[int]] = None
+        for word in words:
+            ids = self._word_postings(word)
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                break
+        return candidates
+
+    def search(
+        self,
+        query: str,
+        cuisine: Optional[str] = None,
+        diet: Optional[str] = None,
+        limit: int = 5,
+    ) -> List[Dict[str, Any]]:
+        """Same matching as search_recipes_mongo: case-insensitive regex per field, first `limit` in import order."""
+        # query matches title/ingredients/instructions; cuisine and diet only ingredients/instructions
+        filters = [(term, field == "query") for field, term in (("query", query), ("cuisine", cuisine), ("diet", diet)) if term]
+
+        candidates: Optional[Set[int]] = None
+        for term, _ in filters:
+            ids = self._candidates(term)
+            if ids is not None:
+                candidates = ids if candidates is None else candidates & ids
+        record_ids: Iterable[int] = sorted(candidates) if candidates is not None else range(self.count)
+
+        compiled = [(_compile(term), include_title) for term, include_title in filters]
+        results: List[Dict[str, Any]] = []
+        for record_id in record_ids:
+            recipe = self.record(record_id)
+            if all(_matches(recipe, pattern, include_title) for pattern, include_title in compiled):
+                results.append(recipe)
+                if len(results) >= limit:
+                    break
+        return results
+
+
+def _compile(term: str) -> "re.Pattern[str]":
+    try:
+        return re.compile(term, re.IGNORECASE)
+    except re.error:
+        return re.compile(re.escape(term), re.IGNORECASE)
+
+
+def _matches(recipe: Dict[str, Any], pattern: "re.Pattern[str]", include_title: bool) -> bool:
+    fields = [recipe.get("instructions") or "", *(recipe.get("ingredients") or [])]
+    if include_title:
+        fields.append(recipe.get("title") or "")
+    return any(pattern.search(str(field)) for field in fields)
+
+
+_SNAPSHOTS: Dict[str, RecipeSnapshot] = {}
+_SNAPSHOTS_LOCK = threading.Lock()
+
+
+def open_snapshot(path: str) -> RecipeSnapshot:
+    """Shared, lazily opened snapshot for path (one mapping per process)."""
+    with _SNAPSHOTS_LOCK:
+        snapshot = _SNAPSHOTS.get(path)
+        if snapshot is None:
+            snapshot = RecipeSnapshot(path)
+            _SNAPSHOTS[path] = snapshot
+            logger.info("Opened recipe snapshot %s (%d recipes)", path, snapshot.count)
+        return snapshot
+
+
+def search_recipes_snapshot(
+    path: str,
+    query: str,
+    cuisine: Optional[str] = None,
+    diet: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    return open_snapshot(path).search(query, cuisine, diet)
@@ -1,11 +1,16 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Dict, List, Tuple
 
-from recipe_agent.db import search_recipes_mongo
+from recipe_agent import prefetch
+from recipe_agent.config import NUTRITION_LOOKUP_CONCURRENCY
+from recipe_agent.units import parse_quantity
 from recipe_agent.usda import fetch_nutrition_for_ingredient
-from recipe_agent.utils import as_number, short_round
+from recipe_agent.utils import as_number, get_snapshot_path, short_round
 from recipe_agent.logging_utils import get_logger
 ToolHandler = Callable[[Dict[str, Any]], Any]
+NutritionLookup = Callable[[str, float, str], Dict[str, float]]
 
 logger = get_logger(__name__)
 
@@ -104,6 +109,81 @@ def build_tools() -> Dict[str, Tool]:
             },
             handler=_tool_scale_recipe,
         ),
+        "calculate_nutrition_batch": Tool(
+            name="calculate_nutrition_batch",
+            description=(
+                "Calculate total and per-serving nutrition for many recipes at once "
+                "(meal plans, catering). Prefer this over repeated calculate_recipe_nutrition calls."
+            ),
+            parameters={
+                "type": "object",
+                "properties": {
+                    "recipes": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "name": {"type": "string"},
+                                "ingredients": {
+                                    "type": "array",
+                                    "items": {
+                                        "type": "object",
+                                        "properties": {
+                                            "name": {"type": "string"},
+                                            "quantity": {"type": "number"},
+                                            "unit": {"type": "string"},
+                                        },
+                                        "required": ["name", "quantity"],
+                                    },
+                                },
+                                "servings": {"type": "integer"},
+                            },
+                            "required": ["ingredients"],
+                        },
+                    },
+                },
+                "required": ["recipes"],
+            },
+            handler=_tool_calculate_nutrition_batch,
+        ),
+        "scale_recipes_batch": Tool(
+            name="scale_recipes_batch",
+            description=(
+                "Scale ingredient quantities for many recipes at once. "
+                "Prefer this over repeated scale_recipe calls."
+            ),
+            parameters={
+                "type": "object",
+                "properties": {
+                    "recipes": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "name": {"type": "string"},
+                                "ingredients": {
+                                    "type": "array",
+                                    "items": {
+                                        "type": "object",
+                                        "properties": {
+                                            "name": {"type": "string"},
+                                            "quantity": {"type": "number"},
+                                            "unit": {"type": "string"},
+                                            "notes": {"type": "string"},
+                                        },
+                                    },
+                                },
+                                "base_servings": {"type": "integer"},
+                                "target_servings": {"type": "integer"},
+                            },
+                            "required": ["ingredients", "base_servings", "target_servings"],
+                        },
+                    },
+                },
+                "required": ["recipes"],
+            },
+            handler=_tool_scale_recipes_batch,
+        ),
     }
 
 def _tool_search_local_recipes(args: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -111,22 +191,95 @@ def _tool_search_local_recipes(args: Dict[str, Any]) -> List[Dict[str, Any]]:
     query = args.get("query") or ""
     cuisine = args.get("cuisine")
     diet = args.get("diet")
-    return search_recipes_mongo(query, cuisine, diet)
+    snapshot_path = get_snapshot_path()
+    if snapshot_path:
+        from recipe_agent.snapshot import search_recipes_snapshot
+
+        results = search_recipes_snapshot(snapshot_path, query, cuisine, diet)
+    else:
+        # Imported on first search so pymongo stays off the import path of tools/agent
+        from recipe_agent.db import search_recipes_mongo
+
+        results = search_recipes_mongo(query, cuisine, diet)
+    # Warm the nutrition cache while the model reads the results
+    prefetch.schedule_recipes(results)
+    return results
 
 def _tool_calculate_recipe_nutrition(args: Dict[str, Any]) -> Dict[str, Any]:
     logger.info("Calculating recipe nutrition")
+    return _recipe_nutrition(args, fetch_nutrition_for_ingredient)
+
+def _tool_scale_recipe(args: Dict[str, Any]) -> Dict[str, Any]:
+    logger.info("Scaling recipe")
+    return _scale_recipe(args)
+
+def _tool_calculate_nutrition_batch(args: Dict[str, Any]) -> Dict[str, Any]:
+    recipes = args.get("recipes") or []
+    logger.info("Calculating nutrition for %d recipes", len(recipes))
+    return {"recipes": calculate_recipes_nutrition(recipes)}
+
+def _tool_scale_recipes_batch(args: Dict[str, Any]) -> Dict[str, Any]:
+    recipes = args.get("recipes") or []
+    logger.info("Scaling %d recipes", len(recipes))
+    return {"recipes": scale_recipes(recipes)}
+
+def calculate_recipes_nutrition(recipes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Nutrition for many recipes. Each distinct (name, quantity, unit) is looked up
+    once across the whole batch, concurrently, and the per-recipe totals are then
+    summed in ingredient order so the output matches calculate_recipe_nutrition exactly.
+    """
+    keys = list({_nutrition_key(item) for recipe in recipes for item in recipe.get("ingredients") or []})
+
+    stats_by_key: Dict[Tuple[str, float, str], Dict[str, float]] = {}
+    if keys:
+        with ThreadPoolExecutor(max_workers=min(NUTRITION_LOOKUP_CONCURRENCY, len(keys))) as pool:
+            # Each lookup runs in a copy of this request's context, so pool threads see its
+            # deadline and the recorder attributes their USDA calls to this run
+            futures = [
+                pool.submit(contextvars.copy_context().run, fetch_nutrition_for_ingredient, *key) for key in keys
+            ]
+            for key, future in zip(keys, futures):
+                stats_by_key[key] = future.result()
+
+    def lookup(name: str, qty: float, unit: str) -> Dict[str, float]:
+        return stats_by_key[(name, qty, unit)]
+
+    results = []
+    for recipe in recipes:
+        result = _recipe_nutrition(recipe, lookup)
+        if recipe.get("name"):
+            result = {"name": recipe["name"], **result}
+        results.append(result)
+    return results
+
+def scale_recipes(recipes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Scale many recipes; each entry takes the same fields as the scale_recipe tool."""
+    results = []
+    for recipe in recipes:
+        result = _scale_recipe(recipe)
+        if recipe.get("name"):
+            result = {"name": recipe["name"], **result}
+        results.append(result)
+    return results
+
+def _nutrition_key(item: Dict[str, Any]) -> Tuple[str, float, str]:
+    name = item.get("name") or ""
+    qty = parse_quantity(item.get("quantity")) or 0.0
+    unit = item.get("unit") or ""
+    return name, qty, unit
+
+def _recipe_nutrition(args: Dict[str, Any], lookup: NutritionLookup) -> Dict[str, Any]:
     ingredients = args.get("ingredients") or []
     servings = args.get("servings") or 1
     
     total_stats = {"calories": 0.0, "protein": 0.0, "fat": 0.0, "carbs": 0.0}
     
     for item in ingredients:
-        name = item.get("name") or ""
-        qty = as_number(item.get("quantity")) or 0.0
-        unit = item.get("unit") or ""
-        
+        name, qty, unit = _nutrition_key(item)
+        prefetch.note_lookup(name)
         # Use USDA lookup
-        stats = fetch_nutrition_for_ingredient(name, qty, unit)
+        stats = lookup(name, qty, unit)
         for k in total_stats:
             total_stats[k] += stats.get(k, 0.0)
             
@@ -142,8 +295,7 @@ def _tool_calculate_recipe_nutrition(args: Dict[str, Any]) -> Dict[str, Any]:
         "servings": servings
     }
 
-def _tool_scale_recipe(args: Dict[str, Any]) -> Dict[str, Any]:
-    logger.info("Scaling recipe")
+def _scale_recipe(args: Dict[str, Any]) -> Dict[str, Any]:
     base_servings = args.get("base_servings") or 2
     target_servings = args.get("target_servings") or base_servings
     ingredients = args.get("ingredients") or []
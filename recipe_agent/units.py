@@ -0,0 +1,203 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from recipe_agent.utils import as_number
+
+# Key used in a compiled portion table for the food's density (grams per ml)
+DENSITY_KEY = "g/ml"
+
+# Grams assumed for a count unit ("1 onion") when the food has no portion data
+DEFAULT_PORTION_GRAMS = 100.0
+
+MASS_GRAMS: Dict[str, float] = {
+    "mg": 0.001,
+    "g": 1.0,
+    "kg": 1000.0,
+    "oz": 28.3495,
+    "lb": 453.592,
+}
+
+VOLUME_ML: Dict[str, float] = {
+    "pinch": 0.31,
+    "dash": 0.62,
+    "ml": 1.0,
+    "tsp": 4.92892,
+    "tbsp": 14.7868,
+    "fl oz": 29.5735,
+    "dl": 100.0,
+    "cup": 236.588,
+    "pint": 473.176,
+    "quart": 946.353,
+    "l": 1000.0,
+    "gallon": 3785.41,
+}
+
+# Count units only convert through per-food portion weights
+COUNT_UNITS = (
+    "each", "small", "medium", "large", "clove", "slice", "stick", "can", "jar",
+    "package", "bunch", "head", "sprig", "leaf", "stalk", "fillet", "bottle",
+)
+
+# Portion keys tried, in order, when the recipe gives no unit at all
+_DEFAULT_COUNT_PORTIONS = ("each", "medium", "large", "small")
+
+_UNIT_SYNONYMS: Dict[str, List[str]] = {
+    "mg": ["milligram", "milligramme"],
+    "g": ["gr", "gm", "gram", "gramme"],
+    "kg": ["kgs", "kilo", "kilogram", "kilogramme"],
+    "oz": ["ounce", "ozs"],
+    "lb": ["lbs", "pound", "#"],
+    "ml": ["milliliter", "millilitre", "cc", "mls"],
+    "l": ["liter", "litre", "lt"],
+    "dl": ["deciliter", "decilitre"],
+    "tsp": ["tsps", "teaspoon", "teas"],
+    "tbsp": ["tbsps", "tbs", "tbl", "tbls", "tablespoon", "tblsp"],
+    "fl oz": ["floz", "fl. oz", "fluid ounce", "fluid oz"],
+    "cup": ["c", "cu"],
+    "pint": ["pt", "pts"],
+    "quart": ["qt", "qts"],
+    "gallon": ["gal", "gals"],
+    "pinch": ["pinches"],
+    "dash": ["dashes"],
+    "each": ["ea", "whole", "piece", "pc", "pcs", "item", "unit"],
+    "small": ["sm"],
+    "medium": ["med"],
+    "large": ["lg", "lrg", "extra large"],
+    "package": ["pkg", "pkgs", "packet", "pack"],
+    "leaf": ["leaves"],
+    "can": ["tin"],
+}
+
+# Case matters for the classic recipe abbreviations "T" (tablespoon) and "t" (teaspoon)
+_CASE_SENSITIVE_ALIASES = {"T": "tbsp", "Tb": "tbsp", "t": "tsp"}
+
+_UNICODE_FRACTIONS = {
+    "½": "1/2", "⅓": "1/3", "⅔": "2/3", "¼": "1/4", "¾": "3/4", "⅕": "1/5",
+    "⅖": "2/5", "⅗": "3/5", "⅘": "4/5", "⅙": "1/6", "⅚": "5/6", "⅛": "1/8",
+    "⅜": "3/8", "⅝": "5/8", "⅞": "7/8",
+}
+
+_NUMBER = r"(?:\d+\s+\d+/\d+|\d+/\d+|\d*\.\d+|\d+)"
+_QUANTITY_RE = re.compile(
+    rf"^\s*({_NUMBER})(?:\s*(?:-|–|to)\s*({_NUMBER}))?(?=[^\d/.]|$)"
+)
+
+
+def _build_aliases() -> Dict[str, str]:
+    aliases: Dict[str, str] = {}
+    canonical_units = list(MASS_GRAMS) + list(VOLUME_ML) + list(COUNT_UNITS)
+    for unit in canonical_units:
+        for name in [unit, *_UNIT_SYNONYMS.get(unit, [])]:
+            for form in (name, f"{name}s", f"{name}es"):
+                aliases.setdefault(form, unit)
+    return aliases
+
+
+# Precompiled once at import: every alias and plural maps straight to its canonical unit
+_ALIASES = _build_aliases()
+
+
+def canonical_unit(unit: Optional[str]) -> Optional[str]:
+    """Map a unit spelling ("Tbsp.", "cups", "c.", "ounces") to its canonical name, or None."""
+    if not unit:
+        return None
+    raw = unit.strip().rstrip(".")
+    if raw in _CASE_SENSITIVE_ALIASES:
+        return _CASE_SENSITIVE_ALIASES[raw]
+    key = " ".join(raw.lower().replace(".", " ").split())
+    return _ALIASES.get(key)
+
+
+def _number_value(text: str) -> float:
+    return sum(
+        int(num) / int(den) if "/" in part else float(part)
+        for part in text.split()
+        for num, _, den in [part.partition("/")]
+    )
+
+
+def split_quantity(text: str) -> Tuple[Optional[float], str]:
+    """Split a leading quantity off text: "1 1/2 cups flour" -> (1.5, "cups flour"). Ranges average."""
+    for symbol, fraction in _UNICODE_FRACTIONS.items():
+        text = text.replace(symbol, f" {fraction}")
+    match = _QUANTITY_RE.match(text)
+    if not match:
+        return None, text.strip()
+    try:
+        low = _number_value(match.group(1))
+        high = _number_value(match.group(2)) if match.group(2) else low
+    except ZeroDivisionError:
+        return None, text.strip()
+    return (low + high) / 2, text[match.end():].strip()
+
+
+def parse_quantity(value: Any) -> Optional[float]:
+    """Numbers pass through; strings like "1 1/2", "3/4", "½" or "2-3" are parsed."""
+    number = as_number(value)
+    if number is not None or not isinstance(value, str):
+        return number
+    quantity, rest = split_quantity(value)
+    return quantity if not rest else None
+
+
+def leading_unit(text: str) -> Tuple[Optional[str], str]:
+    """Split a leading unit off text: "cups flour" -> ("cup", "flour")."""
+    words = text.split()
+    for size in (2, 1):
+        if len(words) >= size:
+            unit = canonical_unit(" ".join(words[:size]))
+            if unit:
+                return unit, " ".join(words[size:])
+    return None, text.strip()
+
+
+def compile_portions(food_portions: List[Dict[str, Any]]) -> Dict[str, float]:
+    """
+    Turn FDC `foodPortions` into {canonical unit: grams per unit}, plus the food's
+    density under DENSITY_KEY when any volume portion is known.
+    """
+    portions: Dict[str, float] = {}
+    for portion in food_portions or []:
+        grams = as_number(portion.get("gramWeight"))
+        if not grams:
+            continue
+
+        measure = portion.get("measureUnit") or {}
+        unit = canonical_unit(measure.get("name")) or canonical_unit(measure.get("abbreviation"))
+        amount = as_number(portion.get("amount"))
+        if unit is None:
+            # SR Legacy puts the unit in `modifier` ("cup, chopped"); FNDDS in `portionDescription` ("1 medium")
+            text = portion.get("portionDescription") or portion.get("modifier") or ""
+            text_amount, rest = split_quantity(text.split(",")[0].split("(")[0])
+            unit, _ = leading_unit(rest)
+            amount = text_amount or amount
+        if unit is None or unit in MASS_GRAMS:
+            continue
+
+        portions.setdefault(unit, grams / (amount or 1.0))
+
+    volume_unit = next((unit for unit in portions if unit in VOLUME_ML), None)
+    if volume_unit:
+        portions[DENSITY_KEY] = portions[volume_unit] / VOLUME_ML[volume_unit]
+    return portions
+
+
+def to_grams(quantity: float, unit: Optional[str], portions: Optional[Dict[str, float]] = None) -> float:
+    """
+    Convert quantity + unit to grams. Mass units are exact; volume and count units
+    use the food's own portion weights or density when known (water density otherwise).
+    """
+    portions = portions or {}
+    canonical = canonical_unit(unit)
+
+    if canonical in MASS_GRAMS:
+        return quantity * MASS_GRAMS[canonical]
+    if canonical in portions:
+        return quantity * portions[canonical]
+    if canonical in VOLUME_ML:
+        return quantity * VOLUME_ML[canonical] * portions.get(DENSITY_KEY, 1.0)
+
+    for key in _DEFAULT_COUNT_PORTIONS:
+        if key in portions:
+            return quantity * portions[key]
+    return quantity * DEFAULT_PORTION_GRAMS
@@ -1,16 +1,120 @@
-import requests
-from typing import Any, Dict, Optional
-from recipe_agent.utils import load_usda_key, as_number
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from recipe_agent import deadline, recorder
+from recipe_agent.config import USDA_CACHE_MAX_FOODS, USDA_CACHE_MAX_SEARCHES, USDA_CACHE_TTL_SECONDS
+from recipe_agent.units import compile_portions, parse_quantity, to_grams
+from recipe_agent.utils import load_usda_key, as_number, normalize_ingredient_name
 
 USDA_BASE_URL = "https://api.nal.usda.gov/fdc/v1"
+USDA_TIMEOUT_SECONDS = 10
+
+
+class _LruCache:
+    """Size-bounded mapping that evicts the least recently used entry, with an optional TTL. Not thread-safe."""
+
+    def __init__(self, max_entries: int, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # key -> (stored_at, value), oldest use first
+        self._entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Any) -> Tuple[bool, Any]:
+        """(found, value); a hit becomes the most recently used entry."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        stored_at, value = entry
+        if self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def discard(self, key: Any) -> bool:
+        """Remove key; True if it was present (and not expired)."""
+        found, _ = self.get(key)
+        if found:
+            del self._entries[key]
+        return found
+
+    def put(self, key: Any, value: Any) -> None:
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+# Process-wide lookup cache shared by every agent run (and batch item), so the
+# same ingredient is only looked up once. Concurrent misses on the same key wait
+# for the first caller instead of issuing duplicate USDA requests. Both caches
+# are bounded (USDA_CACHE_* in config); only clear_cache() empties them outright.
+_CACHE_LOCK = threading.Lock()
+# normalized ingredient name -> fdc_id
+_FDC_ID_CACHE = _LruCache(USDA_CACHE_MAX_SEARCHES, USDA_CACHE_TTL_SECONDS)
+# fdc_id -> {"nutrients": per-100g values, "portions": compiled unit weights}
+_FOOD_CACHE = _LruCache(USDA_CACHE_MAX_FOODS, USDA_CACHE_TTL_SECONDS)
+_IN_FLIGHT: Dict[Tuple[int, Any], threading.Event] = {}
 
 def get_api_key() -> Optional[str]:
     return load_usda_key()
 
+def _cached(cache: _LruCache, key: Any, loader: Callable[[], Any]) -> Any:
+    """Return the cached value for key, calling loader once per key across threads. Empty results are not cached."""
+    flight_key = (id(cache), key)
+    while True:
+        with _CACHE_LOCK:
+            found, value = cache.get(key)
+            if found:
+                return value
+            event = _IN_FLIGHT.get(flight_key)
+            owner = event is None
+            if owner:
+                event = threading.Event()
+                _IN_FLIGHT[flight_key] = event
+        if owner:
+            break
+        # Don't wait on another request's lookup past our own deadline
+        if not event.wait(deadline.timeout(None)):
+            return None
+
+    value = None
+    try:
+        value = loader()
+    finally:
+        with _CACHE_LOCK:
+            if value:
+                cache.put(key, value)
+            _IN_FLIGHT.pop(flight_key, None)
+        event.set()
+    return value
+
+
+def clear_cache() -> None:
+    with _CACHE_LOCK:
+        _FDC_ID_CACHE.clear()
+        _FOOD_CACHE.clear()
+
+
 def search_food(query: str) -> Optional[int]:
-    """Search for a food item and return its FDC ID."""
+    """Search for a food item and return its FDC ID (cached per normalized name)."""
+    key = normalize_ingredient_name(query)
+    return _cached(
+        _FDC_ID_CACHE, key, lambda: recorder.call("usda.search", {"query": key}, lambda: _search_food_uncached(key))
+    )
+
+
+def _search_food_uncached(query: str) -> Optional[int]:
     api_key = get_api_key()
-    if not api_key:
+    if not api_key or deadline.expired():
         return None
     
     params = {
@@ -19,8 +123,12 @@ def search_food(query: str) -> Optional[int]:
         "pageSize": 1,
         "dataType": ["Foundation", "Survey (FNDDS)"] 
     }
+    import requests
+
     try:
-        resp = requests.get(f"{USDA_BASE_URL}/foods/search", params=params, timeout=10)
+        resp = requests.get(
+            f"{USDA_BASE_URL}/foods/search", params=params, timeout=deadline.timeout(USDA_TIMEOUT_SECONDS)
+        )
         resp.raise_for_status()
         data = resp.json()
         foods = data.get("foods", [])
@@ -30,19 +138,48 @@ def search_food(query: str) -> Optional[int]:
         return None
     return None
 
+def get_food(fdc_id: int) -> Dict[str, Dict[str, float]]:
+    """Nutrients (per 100g) and compiled portion weights for an FDC ID, fetched once and cached."""
+    return _cached(
+        _FOOD_CACHE, fdc_id, lambda: recorder.call("usda.food", {"fdc_id": fdc_id}, lambda: _get_food_uncached(fdc_id))
+    ) or {}
+
+
 def get_food_nutrients(fdc_id: int) -> Dict[str, float]:
     """Get calories, protein, fat, carbs for a given FDC ID (per 100g usually)."""
+    return get_food(fdc_id).get("nutrients") or {}
+
+
+def get_food_portions(fdc_id: int) -> Dict[str, float]:
+    """Grams per canonical unit (and density) for an FDC ID, from its `foodPortions`."""
+    return get_food(fdc_id).get("portions") or {}
+
+
+def _get_food_uncached(fdc_id: int) -> Dict[str, Dict[str, float]]:
     api_key = get_api_key()
-    if not api_key:
+    if not api_key or deadline.expired():
         return {}
 
+    import requests
+
     try:
-        resp = requests.get(f"{USDA_BASE_URL}/food/{fdc_id}", params={"api_key": api_key}, timeout=10)
+        resp = requests.get(
+            f"{USDA_BASE_URL}/food/{fdc_id}",
+            params={"api_key": api_key},
+            timeout=deadline.timeout(USDA_TIMEOUT_SECONDS),
+        )
         resp.raise_for_status()
         data = resp.json()
     except Exception:
         return {}
 
+    nutrients = _parse_nutrients(data)
+    if not nutrients:
+        return {}
+    return {"nutrients": nutrients, "portions": compile_portions(data.get("foodPortions") or [])}
+
+
+def _parse_nutrients(data: Dict[str, Any]) -> Dict[str, float]:
     nutrients = {}
     # Standard USDA nutrient IDs
     # 208/1008 = Energy (kcal)
@@ -78,45 +215,22 @@ def get_food_nutrients(fdc_id: int) -> Dict[str, float]:
 
     return nutrients
 
-def fetch_nutrition_for_ingredient(name: str, quantity: float, unit: str) -> Dict[str, float]:
+def fetch_nutrition_for_ingredient(name: str, quantity: Any, unit: str) -> Dict[str, float]:
     """
     Fetch nutrition for an ingredient.
-    USDA return values are typically per 100g.
-    We need to convert user unit to grams.
-    This is a simplified converter.
+    USDA return values are typically per 100g, so the quantity is converted to
+    grams with the unit table in `units` and the food's own FDC portion weights.
     """
     fdc_id = search_food(name)
     if not fdc_id:
         return {}
 
-    # Get per 100g values
-    per_100g = get_food_nutrients(fdc_id)
+    food = get_food(fdc_id)
+    per_100g = food.get("nutrients")
     if not per_100g:
         return {}
 
-    # Simple unit conversion to grams
-    # This is VERY rough. Real apps need a robust density/unit DB.
-    grams = 0.0
-    unit = unit.lower().strip()
-    
-    if unit in ["g", "gram", "grams"]:
-        grams = quantity
-    elif unit in ["kg", "kilogram"]:
-        grams = quantity * 1000
-    elif unit in ["oz", "ounce", "ounces"]:
-        grams = quantity * 28.35
-    elif unit in ["lb", "pound", "pounds"]:
-        grams = quantity * 453.59
-    elif unit in ["cup", "cups"]:
-        grams = quantity * 200 # Rough average for many solids/liquids
-    elif unit in ["tbsp", "tablespoon"]:
-        grams = quantity * 15
-    elif unit in ["tsp", "teaspoon"]:
-        grams = quantity * 5
-    else:
-        # Default assumption: if unit unknown/missing, assume ~100g portion or 'each' ~100g
-        grams = quantity * 100 
-
+    grams = to_grams(parse_quantity(quantity) or 0.0, unit, food.get("portions"))
     ratio = grams / 100.0
     
     return {
@@ -125,4 +239,3 @@ def fetch_nutrition_for_ingredient(name: str, quantity: float, unit: str) -> Dic
         "fat": round(per_100g.get("fat", 0) * ratio, 1),
         "carbs": round(per_100g.get("carbs", 0) * ratio, 1),
     }
-
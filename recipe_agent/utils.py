@@ -37,6 +37,67 @@ def get_mongo_config() -> tuple[str, str]:
     return uri, db_name
 
 
+def get_mongo_pool_config() -> dict[str, int]:
+    """Connection pool, timeout and health-check settings for the Mongo client."""
+    load_env_vars()
+    return {
+        "max_pool_size": int(os.getenv("MONGO_MAX_POOL_SIZE", "50")),
+        "min_pool_size": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+        "server_selection_timeout_ms": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "2000")),
+        "connect_timeout_ms": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "2000")),
+        "socket_timeout_ms": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "5000")),
+        "health_check_interval_s": int(os.getenv("MONGO_HEALTH_CHECK_INTERVAL_S", "10")),
+    }
+
+
+READ_PREFERENCE_MODES = ("primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest")
+
+
+def get_mongo_read_config() -> dict[str, Any]:
+    """
+    MONGO_READ_PREFERENCE: where recipe searches are read from (one of READ_PREFERENCE_MODES).
+    MONGO_MAX_STALENESS_SECONDS: skip secondaries lagging further behind than this
+    (-1 for no limit; MongoDB requires at least 90 otherwise).
+    """
+    load_env_vars()
+    mode = os.getenv("MONGO_READ_PREFERENCE", "primary").strip()
+    modes = {m.lower(): m for m in READ_PREFERENCE_MODES}
+    if mode.lower() not in modes:
+        raise ValueError(f"MONGO_READ_PREFERENCE must be one of {', '.join(READ_PREFERENCE_MODES)}, got {mode!r}")
+    max_staleness = int(os.getenv("MONGO_MAX_STALENESS_SECONDS", "-1"))
+    if max_staleness != -1 and max_staleness < 90:
+        raise ValueError("MONGO_MAX_STALENESS_SECONDS must be -1 or at least 90")
+    if max_staleness != -1 and modes[mode.lower()] == "primary":
+        raise ValueError("MONGO_MAX_STALENESS_SECONDS cannot be combined with MONGO_READ_PREFERENCE=primary")
+    return {"mode": modes[mode.lower()], "max_staleness_s": max_staleness}
+
+
+def get_snapshot_path() -> Optional[str]:
+    """RECIPE_SNAPSHOT_PATH: serve recipe search from this snapshot file instead of MongoDB."""
+    load_env_vars()
+    return os.getenv("RECIPE_SNAPSHOT_PATH") or None
+
+
+def get_recorder_config() -> dict[str, Optional[str]]:
+    """
+    RECIPE_AGENT_RECORD: append external calls to this JSONL file (.gz for gzip).
+    RECIPE_AGENT_REPLAY: serve external calls from a recording instead.
+    RECIPE_AGENT_REPLAY_LATENCY: "real" (sleep for the recorded duration) or "zero".
+    """
+    load_env_vars()
+    return {
+        "record_path": os.getenv("RECIPE_AGENT_RECORD") or None,
+        "replay_path": os.getenv("RECIPE_AGENT_REPLAY") or None,
+        "replay_latency": os.getenv("RECIPE_AGENT_REPLAY_LATENCY", "real").strip().lower(),
+    }
+
+
+def get_session_backend() -> str:
+    """SESSION_BACKEND: "memory" (default, per process) or "mongo" (shared across workers)."""
+    load_env_vars()
+    return os.getenv("SESSION_BACKEND", "memory").strip().lower()
+
+
 def as_number(val: Any) -> Optional[float]:
     try:
         return float(val)
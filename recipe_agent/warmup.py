@@ -0,0 +1,56 @@
+import os
+from typing import Optional, Sequence
+
+from recipe_agent.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+
+def prefork_warmup(ingredients: Optional[Sequence[str]] = None) -> None:
+    """
+    Run once in the master process before workers fork (e.g. gunicorn `preload_app`
+    + `on_starting`). Heavy modules, the tool table and the USDA cache for common
+    ingredients are loaded here and shared with every worker copy-on-write.
+
+    Database connections are *not* opened here: MongoClient is not fork-safe,
+    so each worker opens its own pool in `postfork_init`.
+    """
+    import pymongo  # noqa: F401
+    import requests  # noqa: F401
+
+    from recipe_agent import agent, db, tools, usda  # noqa: F401
+
+    tools.build_tools()
+
+    if ingredients is None:
+        ingredients = [
+            name.strip() for name in os.getenv("WARMUP_INGREDIENTS", "").split(",") if name.strip()
+        ]
+    for name in ingredients:
+        fdc_id = usda.search_food(name)
+        if fdc_id:
+            usda.get_food(fdc_id)
+    if ingredients:
+        logger.info("Warmed USDA cache for %d ingredients", len(ingredients))
+
+
+def postfork_init() -> None:
+    """
+    Run in each worker after fork: open the Mongo pool and start its health checks,
+    or just map the recipe snapshot when search is served from one and nothing else needs Mongo.
+    """
+    from recipe_agent.utils import get_session_backend, get_snapshot_path
+
+    snapshot_path = get_snapshot_path()
+    if snapshot_path:
+        from recipe_agent.snapshot import open_snapshot
+
+        open_snapshot(snapshot_path)
+        if get_session_backend() != "mongo":
+            return
+
+    from recipe_agent import db
+
+    if not db.connect(startup=True):
+        logger.warning("Starting without MongoDB; recipe search will return no results until it is reachable")
+    db.start_health_checks()
@@ -3,7 +3,7 @@ import json
 import logging
 import sys
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -12,7 +12,8 @@ import kagglehub
 from kagglehub import KaggleDatasetAdapter
 import pandas as pd
 
-from recipe_agent.db import get_db
+from recipe_agent.db import get_db, recipes_for_writes
+from recipe_agent.snapshot import write_snapshot
 from recipe_agent.utils import load_env_vars
 
 logging.basicConfig(level=logging.INFO)
@@ -52,15 +53,23 @@ def normalize_recipe(row: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
-def import_from_kaggle(count: int = 1000, batch_size: int = 1000) -> int:
+def import_from_kaggle(
+    count: int = 1000,
+    batch_size: int = 1000,
+    snapshot_path: Optional[str] = None,
+    use_mongo: bool = True,
+) -> int:
     load_env_vars()
     
-    db = get_db()
-    if db is None:
-        logger.error("Cannot connect to MongoDB. Check MONGO_URI in .env")
-        return 0
+    collection = None
+    if use_mongo:
+        db = get_db()
+        if db is None:
+            logger.error("Cannot connect to MongoDB. Check MONGO_URI in .env")
+            return 0
+        # Writes (and the count below) always go to the primary, whatever searches read from
+        collection = recipes_for_writes(db)
 
-    collection = db.recipes
     logger.info(f"Starting import of {count} recipes from Kaggle dataset...")
     
     try:
@@ -80,16 +89,23 @@ def import_from_kaggle(count: int = 1000, batch_size: int = 1000) -> int:
         
         
         recipes_to_insert = []
+        snapshot_recipes = []
         imported = 0
         
         for _, row in df.iterrows():
             recipe = normalize_recipe(row.to_dict())
             if recipe and recipe["title"]:
-                recipes_to_insert.append(recipe)
+                if snapshot_path:
+                    snapshot_recipes.append(recipe)
+                if collection is None:
+                    continue
+                # insert_many adds _id to the dicts it is given; keep the snapshot copy clean
+                recipes_to_insert.append(dict(recipe))
                 
                 if len(recipes_to_insert) >= batch_size:
                     try:
-                        collection.insert_many(recipes_to_insert)
+                        # Unordered: on a sharded cluster mongos can write to all shards in parallel
+                        collection.insert_many(recipes_to_insert, ordered=False)
                         imported += len(recipes_to_insert)
                         logger.info(f"Imported batch: {imported} recipes so far...")
                         recipes_to_insert = []
@@ -99,10 +115,16 @@ def import_from_kaggle(count: int = 1000, batch_size: int = 1000) -> int:
         
         if recipes_to_insert:
             try:
-                collection.insert_many(recipes_to_insert)
+                collection.insert_many(recipes_to_insert, ordered=False)
                 imported += len(recipes_to_insert)
             except Exception as e:
                 logger.error(f"Error inserting final batch: {e}")
+
+        if snapshot_path:
+            written = write_snapshot(snapshot_path, snapshot_recipes)
+            logger.info(f"Wrote {written} recipes to snapshot {snapshot_path}")
+            if collection is None:
+                imported = written
         
         logger.info(f"\nSuccessfully imported {imported} recipes!")
         return imported
@@ -120,15 +142,26 @@ def main():
                        help="Number of recipes to import (default: 1000)")
     parser.add_argument("--batch-size", type=int, default=1000,
                        help="Batch size for MongoDB inserts (default: 1000)")
+    parser.add_argument("--snapshot", metavar="PATH",
+                       help="Also write a memory-mapped search snapshot to PATH")
+    parser.add_argument("--snapshot-only", action="store_true",
+                       help="Only write the snapshot; skip MongoDB (requires --snapshot)")
     
     args = parser.parse_args()
+    if args.snapshot_only and not args.snapshot:
+        parser.error("--snapshot-only requires --snapshot PATH")
     
-    imported = import_from_kaggle(count=args.count, batch_size=args.batch_size)
+    imported = import_from_kaggle(
+        count=args.count,
+        batch_size=args.batch_size,
+        snapshot_path=args.snapshot,
+        use_mongo=not args.snapshot_only,
+    )
     
-    if imported > 0:
+    if imported > 0 and not args.snapshot_only:
         db = get_db()
         
-        total = db.recipes.count_documents({})
+        total = recipes_for_writes(db).count_documents({})
         logger.info(f"\nTotal recipes in database: {total}")
     
     sys.exit(0 if imported > 0 else 1)
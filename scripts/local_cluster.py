@@ -0,0 +1,346 @@
+"""
+Start a throwaway local MongoDB replica set or sharded cluster and check that
+recipe searches are served by secondaries (and, when sharded, spread across shards).
+
+Needs the mongod / mongos binaries (on PATH or via --bin-dir). Everything runs on
+127.0.0.1 in a temporary directory that is removed afterwards.
+
+    python scripts/local_cluster.py                 # 3-node replica set
+    python scripts/local_cluster.py --sharded       # 2 shards x 3 nodes + config server + mongos
+    python scripts/local_cluster.py --sharded --keep   # leave it running to experiment
+
+The `replica_set` and `sharded_cluster` context managers back the pytest fixtures
+in tests/conftest.py, and `check_cluster` returns what the checks observed.
+"""
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pymongo import MongoClient, monitoring  # noqa: E402
+
+HOST = "127.0.0.1"
+START_TIMEOUT_S = 60
+
+
+@dataclass
+class LocalCluster:
+    uri: str
+    sharded: bool
+    # Ports of the nodes that are primaries (one per replica set / shard)
+    primary_ports: Set[int] = field(default_factory=set)
+    shard_names: List[str] = field(default_factory=list)
+    processes: List[subprocess.Popen] = field(default_factory=list)
+
+
+def _binary(bin_dir: Optional[str], name: str) -> str:
+    path = os.path.join(bin_dir, name) if bin_dir else shutil.which(name)
+    if not path or not os.path.exists(path):
+        raise RuntimeError(f"{name} not found; install MongoDB or pass --bin-dir")
+    return path
+
+
+def _wait_for_port(port: int, timeout: float = START_TIMEOUT_S) -> None:
+    stop_at = time.monotonic() + timeout
+    while time.monotonic() < stop_at:
+        try:
+            with socket.create_connection((HOST, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Nothing listening on {HOST}:{port} after {timeout}s")
+
+
+def _start(cluster: LocalCluster, args: List[str], port: int, log_dir: Path) -> None:
+    log_dir.mkdir(parents=True, exist_ok=True)
+    proc = subprocess.Popen(
+        args + ["--port", str(port), "--bind_ip", HOST, "--logpath", str(log_dir / "mongo.log")],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.STDOUT,
+    )
+    cluster.processes.append(proc)
+    _wait_for_port(port)
+
+
+def _start_replica_set(
+    cluster: LocalCluster,
+    bin_dir: Optional[str],
+    base_dir: Path,
+    name: str,
+    ports: List[int],
+    role: Optional[str] = None,
+) -> str:
+    """Start and initiate a replica set; the first port becomes primary. Returns its seed list."""
+    mongod = _binary(bin_dir, "mongod")
+    for port in ports:
+        dbpath = base_dir / f"{name}-{port}"
+        dbpath.mkdir(parents=True, exist_ok=True)
+        args = [mongod, "--replSet", name, "--dbpath", str(dbpath)]
+        if role:
+            args.append(f"--{role}")
+        _start(cluster, args, port, dbpath)
+
+    client: MongoClient = MongoClient(HOST, ports[0], directConnection=True)
+    try:
+        client.admin.command("replSetInitiate", {
+            "_id": name,
+            "configsvr": role == "configsvr",
+            "members": [
+                {"_id": i, "host": f"{HOST}:{port}", "priority": 2 if i == 0 else 1}
+                for i, port in enumerate(ports)
+            ],
+        })
+        stop_at = time.monotonic() + START_TIMEOUT_S
+        while time.monotonic() < stop_at:
+            states = [m["stateStr"] for m in client.admin.command("replSetGetStatus")["members"]]
+            if states[0] == "PRIMARY" and all(state == "SECONDARY" for state in states[1:]):
+                break
+            time.sleep(0.5)
+        else:
+            raise RuntimeError(f"Replica set {name} did not settle: {states}")
+    finally:
+        client.close()
+
+    cluster.primary_ports.add(ports[0])
+    return ",".join(f"{HOST}:{port}" for port in ports)
+
+
+def _stop(cluster: LocalCluster) -> None:
+    for proc in reversed(cluster.processes):
+        proc.terminate()
+    for proc in cluster.processes:
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+@contextmanager
+def replica_set(nodes: int = 3, base_port: int = 27117, bin_dir: Optional[str] = None) -> Iterator[LocalCluster]:
+    base_dir = Path(tempfile.mkdtemp(prefix="recipe-rs-"))
+    ports = [base_port + i for i in range(nodes)]
+    cluster = LocalCluster(uri="", sharded=False)
+    try:
+        seeds = _start_replica_set(cluster, bin_dir, base_dir, "rs0", ports)
+        cluster.uri = f"mongodb://{seeds}/?replicaSet=rs0"
+        yield cluster
+    finally:
+        _stop(cluster)
+        shutil.rmtree(base_dir, ignore_errors=True)
+
+
+@contextmanager
+def sharded_cluster(
+    shards: int = 2,
+    nodes: int = 3,
+    base_port: int = 27217,
+    bin_dir: Optional[str] = None,
+) -> Iterator[LocalCluster]:
+    base_dir = Path(tempfile.mkdtemp(prefix="recipe-shards-"))
+    cluster = LocalCluster(uri="", sharded=True)
+    try:
+        config_seeds = _start_replica_set(cluster, bin_dir, base_dir, "cfg", [base_port], role="configsvr")
+        # The config server's primary never serves recipe reads
+        cluster.primary_ports.discard(base_port)
+
+        shard_seeds: Dict[str, str] = {}
+        for shard in range(shards):
+            name = f"shard{shard}"
+            ports = [base_port + 10 * (shard + 1) + i for i in range(nodes)]
+            shard_seeds[name] = _start_replica_set(cluster, bin_dir, base_dir, name, ports, role="shardsvr")
+
+        mongos_port = base_port + 1
+        _start(
+            cluster,
+            [_binary(bin_dir, "mongos"), "--configdb", f"cfg/{config_seeds}"],
+            mongos_port,
+            base_dir / "mongos",
+        )
+        cluster.uri = f"mongodb://{HOST}:{mongos_port}/"
+        client: MongoClient = MongoClient(cluster.uri)
+        try:
+            for name, seeds in shard_seeds.items():
+                client.admin.command("addShard", f"{name}/{seeds}", name=name)
+        finally:
+            client.close()
+        cluster.shard_names = list(shard_seeds)
+        yield cluster
+    finally:
+        _stop(cluster)
+        shutil.rmtree(base_dir, ignore_errors=True)
+
+
+class _FindListener(monitoring.CommandListener):
+    """Records which server each `find` was sent to."""
+
+    def __init__(self) -> None:
+        self.ports: List[int] = []
+
+    def started(self, event: Any) -> None:
+        if event.command_name == "find":
+            self.ports.append(event.connection_id[1])
+
+    def succeeded(self, event: Any) -> None:
+        pass
+
+    def failed(self, event: Any) -> None:
+        pass
+
+
+def _synthetic_recipes(count: int) -> List[Dict[str, Any]]:
+    flavours = ["chocolate", "lemon", "garlic", "basil", "cinnamon", "ginger", "vanilla", "tomato"]
+    dishes = ["cake", "soup", "bread", "salad", "stew", "pie", "pasta", "curry"]
+    recipes = []
+    for i in range(count):
+        flavour, dish = flavours[i % len(flavours)], dishes[(i // len(flavours)) % len(dishes)]
+        recipes.append({
+            "title": f"{flavour.title()} {dish} #{i}",
+            "ingredients": [f"1 c. {flavour}", "2 eggs", "1 tsp. salt"],
+            "instructions": f"Combine the {flavour} with the rest and cook the {dish}.",
+        })
+    return recipes
+
+
+def app_env(cluster: LocalCluster) -> Dict[str, str]:
+    """Environment that points the app at the cluster, with searches read from secondaries."""
+    return {
+        "MONGO_URI": cluster.uri,
+        "MONGO_DB_NAME": "recipe_agent_cluster_check",
+        "MONGO_READ_PREFERENCE": "secondary",
+        "MONGO_MAX_STALENESS_SECONDS": "90",
+    }
+
+
+def check_cluster(cluster: LocalCluster, count: int = 5000) -> Dict[str, Any]:
+    """
+    Load recipes, point the app at the cluster and record where searches land:
+    `results`/`expected` (search hits vs. the primary's), `ports` of the nodes that
+    served the search, how many of those were primaries, and when sharded the shards a
+    regex search fans out to, the shards an _id lookup is routed to and the per-shard
+    document counts. Returns None for `results` if the app could not connect.
+    """
+    os.environ.update(app_env(cluster))
+    listener = _FindListener()
+    # Must be registered before the app creates its MongoClient
+    monitoring.register(listener)
+
+    from recipe_agent import db
+    from scripts.setup_sharding import shard_distribution, shard_recipes
+
+    db.close()
+    db.search_read_preference.cache_clear()
+    report: Dict[str, Any] = {"results": None}
+    database = db.get_db()
+    if database is None:
+        return report
+
+    admin_client: MongoClient = MongoClient(cluster.uri)
+    try:
+        if cluster.sharded:
+            shard_recipes(admin_client, database.name)
+        db.recipes_for_writes(database).insert_many(_synthetic_recipes(count), ordered=False)
+
+        # Secondaries may lag the majority write briefly; wait until they see the same results
+        expected = list(db.recipes_for_writes(database).find({"title": {"$regex": "chocolate", "$options": "i"}}, {"_id": 0}).limit(5))
+        stop_at = time.monotonic() + 30
+        results: List[Dict[str, Any]] = []
+        while time.monotonic() < stop_at:
+            listener.ports.clear()
+            results = db.search_recipes_mongo("chocolate")
+            if len(results) == len(expected):
+                break
+            time.sleep(0.5)
+        report.update(results=len(results), expected=len(expected))
+
+        if cluster.sharded:
+            search = db.recipes_for_search(database)
+            plan = search.find({"title": {"$regex": "chocolate", "$options": "i"}}).explain()
+            shard_plans = plan.get("queryPlanner", {}).get("winningPlan", {}).get("shards", [])
+            report["ports"] = [entry["serverInfo"]["port"] for entry in shard_plans if "serverInfo" in entry]
+            report["fanout_shards"] = sorted(entry.get("shardName", "") for entry in shard_plans)
+            # An equality match on the hashed shard key is routed to the one shard that owns it
+            some_id = db.recipes_for_writes(database).find_one({}, {"_id": 1})["_id"]
+            lookup_plan = search.find({"_id": some_id}).explain()
+            report["lookup_shards"] = [
+                entry.get("shardName", "")
+                for entry in lookup_plan.get("queryPlanner", {}).get("winningPlan", {}).get("shards", [])
+            ]
+            report["distribution"] = shard_distribution(admin_client, database.name)
+        else:
+            report["ports"] = list(listener.ports)
+        report["primary_reads"] = sum(port in cluster.primary_ports for port in report["ports"])
+    finally:
+        admin_client.drop_database(database.name)
+        admin_client.close()
+        db.close()
+        # Later users of the app in this process read their own MONGO_* settings again
+        db.search_read_preference.cache_clear()
+    return report
+
+
+def verify(cluster: LocalCluster, count: int = 5000) -> bool:
+    """Run check_cluster and print what it saw. True if every check passed."""
+    report = check_cluster(cluster, count)
+    if report["results"] is None:
+        print("Could not connect to the cluster")
+        return False
+    print(f"search returned {report['results']} recipes (primary has {report['expected']})")
+    ok = bool(report["expected"]) and report["results"] == report["expected"]
+    if cluster.sharded:
+        print(f"regex search fanned out to shards {report['fanout_shards']} on ports {report['ports']}")
+        print(f"_id lookup routed to shards {report['lookup_shards']}")
+        print("documents per shard: " + ", ".join(f"{d['shard']}={d['count']}" for d in report["distribution"]))
+        ok &= report["fanout_shards"] == sorted(cluster.shard_names) and len(report["lookup_shards"]) == 1
+        ok &= len(report["distribution"]) == len(cluster.shard_names) and all(d["count"] for d in report["distribution"])
+    else:
+        print(f"find commands sent to ports {report['ports']}")
+    if not report["ports"] or report["primary_reads"]:
+        print(f"expected only secondaries, but {report['primary_reads']} of {len(report['ports'])} reads hit a primary")
+        ok = False
+    print("OK" if ok else "FAILED")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local MongoDB cluster for checking secondary reads and sharding")
+    parser.add_argument("--sharded", action="store_true", help="Start a sharded cluster instead of a replica set")
+    parser.add_argument("--shards", type=int, default=2)
+    parser.add_argument("--nodes", type=int, default=3, help="Members per replica set / shard")
+    parser.add_argument("--count", type=int, default=5000, help="Synthetic recipes to load for the check")
+    parser.add_argument("--bin-dir", help="Directory containing mongod and mongos")
+    parser.add_argument("--keep", action="store_true", help="Keep the cluster running after the check until Ctrl-C")
+    args = parser.parse_args()
+
+    if args.sharded:
+        cluster_cm = sharded_cluster(args.shards, args.nodes, bin_dir=args.bin_dir)
+    else:
+        cluster_cm = replica_set(args.nodes, bin_dir=args.bin_dir)
+
+    try:
+        with cluster_cm as cluster:
+            print(f"Cluster up at {cluster.uri}")
+            ok = verify(cluster, args.count)
+            if args.keep:
+                print("Running; press Ctrl-C to stop")
+                try:
+                    while True:
+                        time.sleep(1)
+                except KeyboardInterrupt:
+                    pass
+    except RuntimeError as exc:
+        sys.exit(f"Could not start the cluster: {exc}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
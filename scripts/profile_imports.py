@@ -0,0 +1,59 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+ROOT = Path(__file__).parent.parent
+
+DEFAULT_MODULES = ["recipe_agent", "recipe_agent.agent", "cli", "server"]
+
+_LINE_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def profile_module(module: str) -> Tuple[float, List[Tuple[int, int, str]]]:
+    """Import `module` in a fresh interpreter with -X importtime; return (wall ms, [(self us, cumulative us, name)])."""
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    code = "import time; t = time.perf_counter()"
+    if module:
+        code += f"; import {module}"
+    code += "; print((time.perf_counter() - t) * 1000)"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            entries.append((int(match.group(1)), int(match.group(2)), match.group(4)))
+    return float(proc.stdout.strip().splitlines()[-1]), entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile import time of the package entrypoints")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES,
+                        help=f"Modules to import (default: {' '.join(DEFAULT_MODULES)})")
+    parser.add_argument("--top", type=int, default=10,
+                        help="Number of slowest imports to list per module (default: 10)")
+    args = parser.parse_args()
+
+    # Modules the bare interpreter imports at startup (site, .pth hooks) are not ours to optimize
+    _, startup = profile_module("")
+    startup_names = {name for _, _, name in startup}
+
+    for module in args.modules:
+        wall_ms, entries = profile_module(module)
+        entries = [entry for entry in entries if entry[2] not in startup_names]
+        print(f"\n{module}: {wall_ms:.1f} ms")
+        for self_us, cumulative_us, name in sorted(entries, key=lambda e: e[1], reverse=True)[:args.top]:
+            print(f"  {cumulative_us / 1000:8.1f} ms cumulative  {self_us / 1000:7.1f} ms self  {name}")
+
+
+if __name__ == "__main__":
+    main()
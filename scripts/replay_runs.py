@@ -0,0 +1,117 @@
+"""
+Re-execute recorded agent runs offline and report where the time goes.
+
+Record production traffic with RECIPE_AGENT_RECORD=runs.jsonl (or runs.jsonl.gz),
+then:
+
+    python scripts/replay_runs.py runs.jsonl --latency zero   # local overhead only
+    python scripts/replay_runs.py runs.jsonl --latency real   # recorded upstream timings
+
+OpenRouter, USDA and Mongo calls are answered from the recording, so no API
+keys or database are needed. Replies that differ from the recorded ones mean
+the local code now makes different requests than it did when recorded.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# db is imported up front so its (pymongo) import time is not counted as overhead of the first run
+from recipe_agent import db, deadline, recorder, usda  # noqa: E402,F401
+from recipe_agent.agent import RecipeAgent  # noqa: E402
+from recipe_agent.client import OpenRouterClient  # noqa: E402
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] if ordered else 0.0
+
+
+def replay(path: str, latency: str = "zero", cold_cache: bool = False, limit: int = 0) -> List[Dict[str, Any]]:
+    records = recorder.load_records(path)
+    runs = [r for r in records if r.get("type") == "run" and "reply" in r]
+    if limit:
+        runs = runs[:limit]
+    upstream_by_run: Dict[str, float] = {}
+    for record in records:
+        if record.get("type") == "call" and record.get("run_id"):
+            upstream_by_run[record["run_id"]] = upstream_by_run.get(record["run_id"], 0.0) + record.get("duration_s", 0.0)
+
+    replayer = recorder.configure(replay_path=path, replay_latency=latency)
+    results = []
+    for run in runs:
+        if cold_cache:
+            usda.clear_cache()
+        inputs = run["input"]
+        client = OpenRouterClient(api_key="replay", model=inputs["model"])
+        agent = RecipeAgent(client, routing_model=inputs.get("routing_model"))
+        misses_before = replayer.stats["misses"]
+
+        start = time.perf_counter()
+        error = None
+        reply = None
+        # Same time budget as the recorded run, so runs cut short by their deadline take the same path
+        with recorder.run_id(run["run_id"]), deadline.use(deadline.Deadline(inputs.get("deadline_seconds"))):
+            try:
+                reply = agent.run(inputs["user_prompt"], inputs.get("system_prompt"), history=inputs.get("history"))["reply"]
+            except Exception as exc:
+                error = f"{type(exc).__name__}: {exc}"
+        wall = time.perf_counter() - start
+
+        upstream = upstream_by_run.get(run["run_id"], 0.0)
+        results.append({
+            "run_id": run["run_id"],
+            "recorded_s": run["duration_s"],
+            "recorded_upstream_s": round(upstream, 4),
+            "replay_s": round(wall, 4),
+            # With zero latency all replay time is local; with real latency subtract the recorded waits
+            "local_s": round(wall if latency == "zero" else max(0.0, wall - upstream), 4),
+            "reply_matches": reply == run["reply"],
+            "misses": replayer.stats["misses"] - misses_before,
+            **({"error": error} if error else {}),
+        })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay recorded agent runs without network access")
+    parser.add_argument("path", help="Recording written with RECIPE_AGENT_RECORD (.jsonl or .jsonl.gz)")
+    parser.add_argument("--latency", choices=["zero", "real"], default="zero",
+                        help="Answer calls immediately or after their recorded duration")
+    parser.add_argument("--cold-cache", action="store_true", help="Clear the USDA cache before every run")
+    parser.add_argument("--limit", type=int, default=0, help="Replay only the first N runs")
+    parser.add_argument("--json", action="store_true", help="Print one JSON result per run")
+    args = parser.parse_args()
+
+    results = replay(args.path, args.latency, args.cold_cache, args.limit)
+    if args.json:
+        for result in results:
+            print(json.dumps(result))
+        return
+    if not results:
+        print("No completed runs in recording")
+        return
+
+    print(f"{'run_id':<34} {'recorded':>9} {'upstream':>9} {'replay':>9} {'local':>9}  match")
+    for r in results:
+        flag = "yes" if r["reply_matches"] else f"NO ({r['misses']} misses)"
+        print(f"{r['run_id']:<34} {r['recorded_s']:>8.3f}s {r['recorded_upstream_s']:>8.3f}s "
+              f"{r['replay_s']:>8.3f}s {r['local_s']:>8.3f}s  {flag}")
+
+    local = [r["local_s"] for r in results]
+    print(f"\n{len(results)} runs, {sum(r['reply_matches'] for r in results)} matching replies")
+    print(f"local overhead: mean {statistics.mean(local) * 1000:.1f}ms, "
+          f"p50 {_percentile(local, 0.5) * 1000:.1f}ms, p95 {_percentile(local, 0.95) * 1000:.1f}ms")
+    recorded = sum(r["recorded_s"] for r in results)
+    upstream = sum(r["recorded_upstream_s"] for r in results)
+    if recorded:
+        print(f"upstream share of recorded time: {upstream / recorded:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Shard the recipes collection on a MongoDB sharded cluster (run against mongos).
+
+Shard key: {_id: "hashed"}.
+
+- Searches are case-insensitive regexes over title/ingredients/instructions,
+  so no field in the query can target a single shard. Every search is a
+  scatter-gather either way, and the best key is the one that spreads
+  documents (and therefore scan work) evenly, so each shard scans 1/N of the
+  collection in parallel.
+- ObjectIds grow monotonically; a ranged _id key would send every import batch
+  to the last chunk on one shard. Hashing spreads inserts across all shards.
+- _id is immutable and always present, so the key never has to be updated.
+
+The `sessions` collection is small and looked up by _id; it stays unsharded on
+the database's primary shard.
+
+    python scripts/setup_sharding.py                      # uses MONGO_URI / MONGO_DB_NAME
+    python scripts/setup_sharding.py --status             # per-shard document counts only
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pymongo import MongoClient  # noqa: E402
+
+from recipe_agent.utils import get_mongo_config  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SHARD_KEY = {"_id": "hashed"}
+
+
+def is_mongos(client: MongoClient) -> bool:
+    return client.admin.command("hello").get("msg") == "isdbgrid"
+
+
+def shard_recipes(client: MongoClient, db_name: str, collection: str = "recipes") -> bool:
+    """Shard db_name.collection on SHARD_KEY. Returns False if it was already sharded."""
+    namespace = f"{db_name}.{collection}"
+    existing = client.config.collections.find_one({"_id": namespace, "dropped": {"$ne": True}})
+    if existing and existing.get("key"):
+        if existing["key"] != SHARD_KEY:
+            logger.warning(f"{namespace} is already sharded on {existing['key']}, not {SHARD_KEY}")
+        else:
+            logger.info(f"{namespace} is already sharded on {SHARD_KEY}")
+        return False
+
+    client.admin.command("enableSharding", db_name)
+    # shardCollection needs an index on the key when the collection already holds data
+    client[db_name][collection].create_index(list(SHARD_KEY.items()))
+    client.admin.command("shardCollection", namespace, key=SHARD_KEY)
+    logger.info(f"Sharded {namespace} on {SHARD_KEY}")
+    return True
+
+
+def shard_distribution(client: MongoClient, db_name: str, collection: str = "recipes") -> List[Dict[str, Any]]:
+    """Document count per shard (one entry per shard holding data for the collection)."""
+    stats = client[db_name][collection].aggregate([{"$collStats": {"count": {}}}])
+    return sorted(
+        ({"shard": entry.get("shard", "unsharded"), "count": entry.get("count", 0)} for entry in stats),
+        key=lambda entry: entry["shard"],
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Shard the recipes collection on a MongoDB cluster")
+    parser.add_argument("--uri", help="mongos URI (default: MONGO_URI)")
+    parser.add_argument("--db", help="Database name (default: MONGO_DB_NAME)")
+    parser.add_argument("--status", action="store_true", help="Only print the per-shard distribution")
+    args = parser.parse_args()
+
+    uri, db_name = get_mongo_config()
+    client: MongoClient = MongoClient(args.uri or uri, serverSelectionTimeoutMS=5000)
+    db_name = args.db or db_name
+    try:
+        if not is_mongos(client):
+            logger.error("Not connected to mongos; sharding needs a sharded cluster")
+            sys.exit(1)
+        if not args.status:
+            shard_recipes(client, db_name)
+        total = 0
+        for entry in shard_distribution(client, db_name):
+            total += entry["count"]
+            logger.info(f"{entry['shard']}: {entry['count']} recipes")
+        logger.info(f"Total: {total} recipes")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,62 @@
+import asyncio
+import json
+import threading
 import uuid
-from typing import Any, Dict, Optional, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
 
+from recipe_agent import deadline
 from recipe_agent.agent import RecipeAgent
 from recipe_agent.client import OpenRouterClient
-from recipe_agent.config import DEFAULT_MODEL, SYSTEM_MESSAGES
-from recipe_agent.logging_utils import get_logger, setup_logging
-from recipe_agent.tools import build_tools
+from recipe_agent.config import (
+    BATCH_MAX_CONCURRENCY,
+    BATCH_MAX_ITEMS,
+    DEFAULT_MODEL,
+    LOG_TRACE_SAMPLE_RATE,
+    REQUEST_DEADLINE_SECONDS,
+    REQUEST_MAX_DEADLINE_SECONDS,
+    SYSTEM_MESSAGES,
+)
+from recipe_agent.logging_utils import dropped_records, get_logger, setup_logging
+from recipe_agent.sessions import SessionStoreUnavailable, get_session_store
+from recipe_agent.tools import Tool, build_tools
 from recipe_agent.utils import load_api_key
+from recipe_agent.warmup import postfork_init
 
-setup_logging()
 logger = get_logger(__name__)
-app = FastAPI(title="Recipe Agent", version="0.1.0")
-TOOLS = build_tools()
+
+# How often a running /responses request or batch stream checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = 0.5
+# session_id values are server-issued UUIDs; this only bounds what a client can send back
+SESSION_ID_MAX_CHARS = 128
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Runs per worker, after any pre-fork warmup in the master process
+    setup_logging()
+    get_tools()
+    # Connect up front so the first request doesn't pay for server selection
+    postfork_init()
+    yield
+    from recipe_agent import db
+
+    db.close()
+
+
+app = FastAPI(title="Recipe Agent", version="0.1.0", lifespan=lifespan)
+
+
+@lru_cache(maxsize=None)
+def get_tools() -> Dict[str, Tool]:
+    return build_tools()
 
 
 class ChatRequest(BaseModel):
@@ -94,6 +136,16 @@ def _format_responses_reply(reply: str, model: str) -> Dict[str, Any]:
 def health() -> Dict[str, str]:
     return {"status": "ok"}
 
+@app.get("/metrics")
+def metrics() -> Dict[str, Any]:
+    from recipe_agent import db, prefetch
+
+    return {
+        "mongo": db.get_pool_stats(),
+        "prefetch": prefetch.get_stats(),
+        "logging": {"dropped_records": dropped_records()},
+    }
+
 @app.get("/tools/health")
 def tools_health() -> Dict[str, str]:
     return {"status": "ok"}
@@ -107,13 +159,13 @@ def list_tools() -> Dict[str, Any]:
                 "description": tool.description,
                 "parameters": tool.parameters,
             }
-            for tool in TOOLS.values()
+            for tool in get_tools().values()
         ]
     }
 
 @app.post("/tools")
 def execute_tool(payload: ToolExecutionRequest) -> Dict[str, Any]:
-    tool = TOOLS.get(payload.tool_name)
+    tool = get_tools().get(payload.tool_name)
     if not tool:
         raise HTTPException(status_code=404, detail=f"Unknown tool: {payload.tool_name}")
 
@@ -133,28 +185,221 @@ def execute_tool(payload: ToolExecutionRequest) -> Dict[str, Any]:
     }
 
 
-@app.post("/responses")
-def responses(payload: Dict[str, Any]) -> Dict[str, Any]:
-
-    logger.info("Received request")
-    model = payload.get("model") or DEFAULT_MODEL
+def _request_deadline(payload: Dict[str, Any]) -> deadline.Deadline:
+    """Deadline from the payload's `deadline_seconds`, or the configured default."""
+    value = payload.get("deadline_seconds")
+    if value is None:
+        return deadline.Deadline(REQUEST_DEADLINE_SECONDS)
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError) as exc:
+        raise HTTPException(status_code=400, detail="deadline_seconds must be a number") from exc
+    if not 0 < seconds <= REQUEST_MAX_DEADLINE_SECONDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"deadline_seconds must be greater than 0 and at most {REQUEST_MAX_DEADLINE_SECONDS}",
+        )
+    return deadline.Deadline(seconds)
+
+
+def _run_response(
+    payload: Dict[str, Any],
+    default_model: str = DEFAULT_MODEL,
+    request_deadline: Optional[deadline.Deadline] = None,
+) -> Dict[str, Any]:
+    if request_deadline is None:
+        request_deadline = _request_deadline(payload)
+    model = payload.get("model") or default_model
     messages = payload.get("input") or []
     system_prompt, user_prompt = _extract_messages(messages)
-    if not system_prompt:
+
+    # With a session_id the client sends only the new turn; earlier messages come from the store
+    session_id = payload.get("session_id")
+    if session_id is not None and (not isinstance(session_id, str) or len(session_id) > SESSION_ID_MAX_CHARS):
+        # Ids are used as store keys and Mongo _id values; anything but a plain string is rejected
+        raise HTTPException(status_code=400, detail="session_id must be a string (as returned by the server)")
+    history = None
+    if session_id:
+        try:
+            history = get_session_store().get(session_id)
+        except SessionStoreUnavailable as exc:
+            raise HTTPException(status_code=503, detail=f"Session store unavailable: {exc}") from exc
+        if history is None:
+            raise HTTPException(status_code=404, detail=f"Unknown or expired session: {session_id}")
+    elif payload.get("store"):
+        session_id = str(uuid.uuid4())
+
+    if not system_prompt and history is None:
         system_prompt = SYSTEM_MESSAGES[0]["content"]
 
     agent = _build_agent(model)
     try:
-        result = agent.run(user_prompt, system_prompt)
+        with deadline.use(request_deadline):
+            result = agent.run(user_prompt, system_prompt or None, history=history)
+    except deadline.DeadlineExceeded as exc:
+        logger.warning("Request stopped: %s", exc)
+        raise HTTPException(status_code=504, detail=f"Request timed out: {exc}") from exc
     except Exception as exc:
         logger.exception("Agent error")
         raise HTTPException(status_code=500, detail=f"Agent error: {exc}") from exc
 
     if result.get("trace"):
-        logger.info("Trace: %s", result["trace"])
+        # Full tool outputs are large; log a sample, truncated by the logging setup
+        logger.info("Trace: %s", result["trace"], extra={"sample_rate": LOG_TRACE_SAMPLE_RATE, "model": model})
 
     reply = result.get("reply", "[no reply]")
-    return _format_responses_reply(reply, model)
+    response = _format_responses_reply(reply, model)
+    if session_id:
+        try:
+            get_session_store().save(session_id, result["messages"])
+        except SessionStoreUnavailable:
+            # The answer is still good; just don't hand out an id that would 404 on the next turn
+            logger.warning("Session %s was not saved", session_id, exc_info=True)
+        else:
+            response["session_id"] = session_id
+    return response
+
+
+def _parse_batch_body(body: bytes, content_type: str) -> tuple[List[Any], Dict[str, Any]]:
+    """Accept a JSON array, a JSON object with an `inputs` array, or JSONL (one payload per line)."""
+    text = body.decode("utf-8")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        return [json.loads(line) for line in text.splitlines() if line.strip()], {}
+
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        # Not a single JSON document; fall back to JSONL
+        return [json.loads(line) for line in text.splitlines() if line.strip()], {}
+
+    if isinstance(data, list):
+        return data, {}
+    if isinstance(data, dict) and isinstance(data.get("inputs"), list):
+        options = {k: v for k, v in data.items() if k != "inputs"}
+        return data["inputs"], options
+    raise ValueError("Expected a JSON array, an object with an 'inputs' array, or JSONL")
+
+
+class _BatchDeadlines:
+    """
+    Deadlines of the items of one batch stream. Each item's deadline starts when the
+    item starts running; all of them are cancelled together if the client goes away.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._deadlines: List[deadline.Deadline] = []
+        self._cancelled = False
+
+    def start(self, payload: Dict[str, Any]) -> deadline.Deadline:
+        item_deadline = _request_deadline(payload)
+        with self._lock:
+            self._deadlines.append(item_deadline)
+            if self._cancelled:
+                item_deadline.cancel()
+        return item_deadline
+
+    def cancel_all(self) -> None:
+        with self._lock:
+            self._cancelled = True
+            for item_deadline in self._deadlines:
+                item_deadline.cancel()
+
+
+def _run_batch_item(index: int, item: Any, default_model: str, deadlines: _BatchDeadlines) -> Dict[str, Any]:
+    if not isinstance(item, dict):
+        return {"index": index, "status": "failed", "error": "Item must be a JSON object"}
+    try:
+        response = _run_response(item, default_model, deadlines.start(item))
+    except HTTPException as exc:
+        return {"index": index, "status": "failed", "error": exc.detail}
+    except Exception as exc:
+        logger.exception("Batch item %d failed", index)
+        return {"index": index, "status": "failed", "error": str(exc)}
+    return {"index": index, "status": "completed", "response": response}
+
+
+async def _stream_batch(
+    items: List[Any], default_model: str, concurrency: int, request: Request
+) -> AsyncIterator[str]:
+    # Results are yielded as they finish; `index` ties each line back to its input
+    deadlines = _BatchDeadlines()
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        pending = {
+            asyncio.wrap_future(pool.submit(_run_batch_item, index, item, default_model, deadlines))
+            for index, item in enumerate(items)
+        }
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=DISCONNECT_POLL_SECONDS, return_when=asyncio.FIRST_COMPLETED
+            )
+            for future in done:
+                yield json.dumps(future.result(), ensure_ascii=False) + "\n"
+            if pending and await request.is_disconnected():
+                logger.info("Client disconnected; cancelling %d batch items", len(pending))
+                break
+    finally:
+        # Disconnected or closed early: running items stop at their next deadline check,
+        # queued ones never start, and ending the stream doesn't wait for either
+        deadlines.cancel_all()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+@app.post("/responses")
+async def responses(payload: Dict[str, Any], request: Request) -> Dict[str, Any]:
+
+    logger.info("Received request")
+    request_deadline = _request_deadline(payload)
+    work = asyncio.ensure_future(run_in_threadpool(_run_response, payload, DEFAULT_MODEL, request_deadline))
+    while not work.done():
+        await asyncio.wait({work}, timeout=DISCONNECT_POLL_SECONDS)
+        if not work.done() and await request.is_disconnected():
+            # The agent stops at its next deadline check instead of finishing for nobody
+            logger.info("Client disconnected; cancelling request")
+            request_deadline.cancel()
+            break
+    return await work
+
+
+@app.delete("/sessions/{session_id}")
+def delete_session(session_id: str) -> Dict[str, str]:
+    try:
+        get_session_store().delete(session_id)
+    except SessionStoreUnavailable as exc:
+        raise HTTPException(status_code=503, detail=f"Session store unavailable: {exc}") from exc
+    return {"session_id": session_id, "status": "deleted"}
+
+
+@app.post("/responses/batch")
+async def responses_batch(request: Request) -> StreamingResponse:
+    body = await request.body()
+    try:
+        items, options = _parse_batch_body(body, request.headers.get("content-type", ""))
+    except ValueError as exc:
+        # json.JSONDecodeError is a ValueError subclass
+        raise HTTPException(status_code=400, detail=f"Invalid batch body: {exc}") from exc
+
+    if not items:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {len(items)} items; the limit is {BATCH_MAX_ITEMS}",
+        )
+
+    default_model = options.get("model") or DEFAULT_MODEL
+    try:
+        requested = int(options.get("concurrency") or BATCH_MAX_CONCURRENCY)
+    except (TypeError, ValueError) as exc:
+        raise HTTPException(status_code=400, detail="concurrency must be an integer") from exc
+    concurrency = max(1, min(requested, BATCH_MAX_CONCURRENCY, len(items)))
+
+    logger.info("Received batch of %d items (concurrency=%d)", len(items), concurrency)
+    return StreamingResponse(
+        _stream_batch(items, default_model, concurrency, request),
+        media_type="application/x-ndjson",
+    )
 
 
 def create_app() -> FastAPI:
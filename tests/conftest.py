@@ -0,0 +1,37 @@
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Iterator, Optional
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.local_cluster import LocalCluster, replica_set, sharded_cluster  # noqa: E402
+
+
+def _mongo_bin_dir(*names: str) -> Optional[str]:
+    """MONGO_BIN_DIR, or None to use PATH; skips the test if any of the binaries is missing."""
+    bin_dir = os.getenv("MONGO_BIN_DIR")
+    missing = [
+        name for name in names
+        if not (os.path.exists(os.path.join(bin_dir, name)) if bin_dir else shutil.which(name))
+    ]
+    if missing:
+        pytest.skip(f"{', '.join(missing)} not found; put it on PATH or set MONGO_BIN_DIR")
+    return bin_dir
+
+
+@pytest.fixture(scope="session")
+def mongo_replica_set() -> Iterator[LocalCluster]:
+    """A throwaway 3-node local replica set (scripts/local_cluster.py)."""
+    with replica_set(bin_dir=_mongo_bin_dir("mongod")) as cluster:
+        yield cluster
+
+
+@pytest.fixture(scope="session")
+def mongo_sharded_cluster() -> Iterator[LocalCluster]:
+    """A throwaway 2-shard local cluster behind mongos (scripts/local_cluster.py)."""
+    with sharded_cluster(bin_dir=_mongo_bin_dir("mongod", "mongos")) as cluster:
+        yield cluster
@@ -0,0 +1,121 @@
+import json
+import time
+
+import pytest
+
+from recipe_agent import agent as agent_module
+from recipe_agent import deadline
+from recipe_agent.agent import RecipeAgent
+from recipe_agent.tools import Tool
+
+
+class FakeClient:
+    """
+    Plays back assistant messages, or (message, finish_reason) pairs; like the real
+    client, refuses to start once the deadline is gone.
+    """
+
+    def __init__(self, replies):
+        self.model = "synthesis-model"
+        self.replies = list(replies)
+        self.calls = []
+        self.last_usage = {"total_tokens": 10}
+        self.last_attempts = [{}]
+        self.last_finish_reason = None
+
+    def chat(self, messages, tools=None, model=None, max_tokens=None):
+        deadline.check("fake chat")
+        self.calls.append({"model": model, "tools": tools, "max_tokens": max_tokens, "remaining": deadline.remaining()})
+        reply = self.replies.pop(0)
+        message, self.last_finish_reason = reply if isinstance(reply, tuple) else (reply, "stop")
+        return message
+
+
+def _tool_call(name, arguments):
+    return {"id": f"call_{name}", "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+
+def _slow_tool(seconds):
+    def handler(args):
+        time.sleep(seconds)
+        return {"ok": True}
+
+    return Tool(name="slow", description="Takes a while", parameters={"type": "object", "properties": {}}, handler=handler)
+
+
+def test_deadline_expiring_after_tools_still_answers(monkeypatch):
+    monkeypatch.setattr(agent_module, "DEADLINE_FINAL_ANSWER_SECONDS", 0.5)
+    client = FakeClient([
+        {"role": "assistant", "content": None, "tool_calls": [_tool_call("slow", {})]},
+        {"role": "assistant", "content": "best effort answer"},
+    ])
+    agent = RecipeAgent(client, routing_model=None)
+    agent.tools = {"slow": _slow_tool(0.4)}
+
+    # 0.3s for tool turns, 0.5s reserved: the tool uses up the turn budget before the next model call
+    with deadline.use(deadline.Deadline(0.8)):
+        result = agent.run("question")
+
+    assert result["reply"] == "best effort answer"
+    assert len(client.calls) == 2
+    # The second call is the final answer: no tools offered, made inside the reserved time
+    assert client.calls[1]["tools"] == []
+    assert client.calls[1]["remaining"] > 0
+    assert result["messages"][-2]["role"] == "tool"
+    assert any("Deadline close" in line for line in result["trace"])
+
+
+def test_cancelled_request_is_not_answered(monkeypatch):
+    monkeypatch.setattr(agent_module, "DEADLINE_FINAL_ANSWER_SECONDS", 0.5)
+    client = FakeClient([
+        {"role": "assistant", "content": None, "tool_calls": [_tool_call("slow", {})]},
+        {"role": "assistant", "content": "unused"},
+    ])
+    agent = RecipeAgent(client, routing_model=None)
+    request_deadline = deadline.Deadline(5)
+
+    def cancel(args):
+        request_deadline.cancel()
+        return {}
+
+    agent.tools = {"slow": Tool(name="slow", description="", parameters={}, handler=cancel)}
+    with deadline.use(request_deadline), pytest.raises(deadline.DeadlineExceeded):
+        agent.run("question")
+    assert len(client.calls) == 1
+
+
+def test_routing_cut_off_in_batch_tool_retries_uncapped(monkeypatch):
+    monkeypatch.setattr(agent_module, "ROUTING_MAX_TOKENS", 20)
+    recipes = {"recipes": [
+        {"name": f"dish {i}", "base_servings": 2, "target_servings": 20,
+         "ingredients": [{"name": "flour", "quantity": 1, "unit": "c."}]}
+        for i in range(10)
+    ]}
+    arguments = json.dumps(recipes)
+    truncated = {"id": "call_1", "type": "function", "function": {"name": "scale_recipes_batch", "arguments": arguments[:60]}}
+    client = FakeClient([
+        # Capped routing call stops in the middle of the batch arguments
+        ({"role": "assistant", "content": None, "tool_calls": [truncated]}, "length"),
+        # Redone on the routing model without the cap
+        ({"role": "assistant", "content": None, "tool_calls": [_tool_call("scale_recipes_batch", recipes)]}, "tool_calls"),
+        ({"role": "assistant", "content": "DONE"}, "stop"),
+        ({"role": "assistant", "content": "Scaled all ten."}, "stop"),
+    ])
+    agent = RecipeAgent(client, routing_model="routing-model")
+
+    result = agent.run("Scale these for 20 people")
+
+    assert result["reply"] == "Scaled all ten."
+    assert [(call["model"], call["max_tokens"]) for call in client.calls] == [
+        ("routing-model", 20), ("routing-model", None), ("routing-model", 20), ("synthesis-model", None),
+    ]
+    # The batch turn stayed on the routing model: the configured model only wrote the answer
+    routing = result["phases"]["routing"]
+    assert routing["uncapped_retries"] == 1 and routing["escalations"] == 0 and routing["accepted"] == 1
+    # Cut-off call and stop signal are overhead; the accepted call is not
+    assert routing["overhead_tokens"] == 20 and routing["accepted_tokens"] == 10
+    tool_message = next(m for m in result["messages"] if m["role"] == "tool")
+    assert len(json.loads(tool_message["content"])["recipes"]) == 10
+    # Baseline: the accepted turn on the configured model (10 tokens per call here) plus its one call
+    assert routing["baseline_tokens"] == 20 and routing["saved_tokens"] == 20 - (10 + 30)
+    assert any("saved_tokens=" in line for line in result["trace"])
@@ -0,0 +1,56 @@
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+
+import server
+from recipe_agent import db
+
+
+@pytest.fixture(autouse=True)
+def fresh_db_state(monkeypatch):
+    db.search_read_preference.cache_clear()
+    monkeypatch.setattr(db, "_CONFIG_ERROR", None)
+    monkeypatch.setattr(db, "_CLIENT", None)
+    monkeypatch.setattr(db, "_BREAKER", db.CircuitBreaker(failure_threshold=3, reset_seconds=30))
+    yield
+    db.search_read_preference.cache_clear()
+
+
+class _UnreachableClient:
+    created = 0
+
+    def __init__(self, *args, **kwargs):
+        _UnreachableClient.created += 1
+        self.admin = self
+
+    def command(self, *args, **kwargs):
+        raise ServerSelectionTimeoutError("no servers")
+
+    def close(self):
+        pass
+
+
+def test_invalid_read_preference_is_reported_by_metrics(monkeypatch):
+    monkeypatch.setenv("MONGO_READ_PREFERENCE", "fastest")
+    monkeypatch.setattr(db, "MongoClient", _UnreachableClient)
+    created = _UnreachableClient.created
+
+    assert db.connect(startup=True) is False
+    # Config errors never reach the server
+    assert _UnreachableClient.created == created
+
+    stats = server.metrics()["mongo"]
+    assert "MONGO_READ_PREFERENCE" in stats["config_error"]
+    assert stats["search_read_preference"] is None and stats["connected"] is False
+
+
+def test_failed_startup_ping_opens_the_breaker(monkeypatch):
+    monkeypatch.setenv("MONGO_READ_PREFERENCE", "primary")
+    monkeypatch.setattr(db, "MongoClient", _UnreachableClient)
+
+    assert db.connect(startup=True) is False
+    assert db._BREAKER.state == "open"
+
+    # Searches fail fast instead of each waiting out server selection
+    created = _UnreachableClient.created
+    assert db.get_db() is None
+    assert _UnreachableClient.created == created
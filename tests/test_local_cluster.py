@@ -0,0 +1,33 @@
+"""Secondary reads and shard routing against a real local cluster; skipped without mongod/mongos."""
+from scripts import local_cluster
+
+
+def _point_app_at(cluster, monkeypatch):
+    # check_cluster sets these too; going through monkeypatch restores them afterwards
+    for key, value in local_cluster.app_env(cluster).items():
+        monkeypatch.setenv(key, value)
+
+
+def test_replica_set_searches_read_from_secondaries(mongo_replica_set, monkeypatch):
+    _point_app_at(mongo_replica_set, monkeypatch)
+    report = local_cluster.check_cluster(mongo_replica_set, count=2000)
+
+    assert report["results"] is not None, "could not connect to the replica set"
+    assert report["expected"] and report["results"] == report["expected"]
+    assert report["ports"] and report["primary_reads"] == 0
+
+
+def test_sharded_searches_fan_out_and_lookups_target_one_shard(mongo_sharded_cluster, monkeypatch):
+    _point_app_at(mongo_sharded_cluster, monkeypatch)
+    report = local_cluster.check_cluster(mongo_sharded_cluster, count=2000)
+
+    assert report["results"] is not None, "could not connect through mongos"
+    assert report["expected"] and report["results"] == report["expected"]
+    # Regex searches carry no shard key, so every shard scans its part, on a secondary
+    assert report["fanout_shards"] == sorted(mongo_sharded_cluster.shard_names)
+    assert report["ports"] and report["primary_reads"] == 0
+    # The hashed _id key routes an _id match to exactly one shard
+    assert len(report["lookup_shards"]) == 1
+    # ...and spreads the documents over all shards
+    counts = {entry["shard"]: entry["count"] for entry in report["distribution"]}
+    assert sorted(counts) == sorted(mongo_sharded_cluster.shard_names) and all(counts.values())
@@ -0,0 +1,26 @@
+import logging
+import queue
+import threading
+
+from recipe_agent.logging_utils import DroppingQueueHandler
+
+
+def test_concurrent_drops_are_all_counted_per_handler():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    other = DroppingQueueHandler(queue.Queue(maxsize=1))
+    record = logging.makeLogRecord({"msg": "x"})
+    threads_n, per_thread = 8, 2000
+
+    def flood():
+        for _ in range(per_thread):
+            handler.enqueue(record)
+
+    threads = [threading.Thread(target=flood) for _ in range(threads_n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # One record fits in the queue; every other one is counted, on this handler only
+    assert handler.dropped == threads_n * per_thread - 1
+    assert other.dropped == 0
@@ -0,0 +1,27 @@
+import time
+
+from recipe_agent import deadline, prefetch, recorder, usda
+
+
+def test_prefetch_runs_outside_the_triggering_run(monkeypatch):
+    seen = []
+
+    def search_food(name):
+        seen.append((deadline.current(), recorder._RUN_ID.get()))
+        return 1
+
+    monkeypatch.setattr(usda, "get_api_key", lambda: "key")
+    monkeypatch.setattr(usda, "search_food", search_food)
+    monkeypatch.setattr(usda, "get_food", lambda fdc_id: {"nutrients": {"calories": 1.0}})
+    monkeypatch.setattr(prefetch, "_PREFETCHED", usda._LruCache(2))
+
+    with deadline.use(deadline.Deadline(0.001)), recorder.run_id("run-1"):
+        prefetch.schedule_recipes([{"ingredients": ["1 c. sugar", "2 eggs", "1 tsp. salt"]}])
+    stop_at = time.monotonic() + 5
+    while prefetch.get_stats()["pending"] and time.monotonic() < stop_at:
+        time.sleep(0.01)
+
+    # Neither the (already expired) deadline nor the run id carried over
+    assert len(seen) == 3 and all(entry == (None, None) for entry in seen)
+    # Only the two most recent names are remembered
+    assert len(prefetch._PREFETCHED) == 2
@@ -0,0 +1,66 @@
+import pytest
+
+from recipe_agent import deadline, recorder
+from recipe_agent.agent import RecipeAgent
+from recipe_agent.client import OpenRouterClient, RetryableError
+from scripts import replay_runs
+
+
+@pytest.fixture
+def recording(tmp_path):
+    path = str(tmp_path / "runs.jsonl")
+    yield path
+    recorder.configure()
+
+
+def _fail(exc):
+    def fn(*args, **kwargs):
+        raise exc
+
+    return fn
+
+
+def test_replay_reraises_deadline_and_retryable_errors_by_type(recording):
+    live = recorder.configure(record_path=recording)
+    for name, exc in [("deadline", deadline.DeadlineExceeded("chat: deadline exceeded")),
+                      ("retryable", RetryableError("503 busy")),
+                      ("other", ValueError("bad"))]:
+        with pytest.raises(type(exc)):
+            live.call("test", {"name": name}, _fail(exc))
+    live.close()
+
+    replay = recorder.configure(replay_path=recording, replay_latency="zero")
+    with pytest.raises(deadline.DeadlineExceeded, match="^chat: deadline exceeded$"):
+        replay.call("test", {"name": "deadline"}, _fail(AssertionError("live call during replay")))
+    with pytest.raises(RetryableError, match="^503 busy$"):
+        replay.call("test", {"name": "retryable"}, _fail(AssertionError("live call during replay")))
+    with pytest.raises(recorder.RecordedError, match="ValueError: bad"):
+        replay.call("test", {"name": "other"}, _fail(AssertionError("live call during replay")))
+
+
+def test_replay_restores_the_run_budget(recording, monkeypatch):
+    monkeypatch.setattr(
+        OpenRouterClient, "_hedged_post",
+        lambda self, payload, attempts: {"choices": [{"message": {"role": "assistant", "content": "hi"}}]},
+    )
+    recorder.configure(record_path=recording)
+    with deadline.use(deadline.Deadline(30)):
+        RecipeAgent(OpenRouterClient(api_key="key", model="model"), routing_model=None).run("question")
+    recorder.get_recorder().close()
+
+    run = next(r for r in recorder.load_records(recording) if r["type"] == "run")
+    assert 29 < run["input"]["deadline_seconds"] <= 30
+
+    budgets = []
+    original_run = RecipeAgent._run
+
+    def spy(self, *args, **kwargs):
+        budgets.append(deadline.remaining())
+        return original_run(self, *args, **kwargs)
+
+    monkeypatch.setattr(RecipeAgent, "_run", spy)
+    monkeypatch.setattr(OpenRouterClient, "_hedged_post", _fail(AssertionError("live call during replay")))
+    [result] = replay_runs.replay(recording)
+
+    assert result["reply_matches"] and "error" not in result
+    assert budgets and 29 < budgets[0] <= 30
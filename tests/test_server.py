@@ -0,0 +1,51 @@
+import asyncio
+import json
+import time
+
+import server
+from fastapi import HTTPException
+
+
+class _Request:
+    """Stands in for the Starlette request; only disconnect polling is used."""
+
+    def __init__(self) -> None:
+        self.disconnected = False
+
+    async def is_disconnected(self) -> bool:
+        return self.disconnected
+
+
+def test_disconnect_mid_batch_cancels_remaining_items(monkeypatch):
+    started = {}
+
+    def fake_run_response(payload, default_model, request_deadline):
+        started[payload["index"]] = request_deadline
+        if payload["index"] == 0:
+            return {"reply": "fast"}
+        # A long agent run: only ends when its deadline is cancelled
+        while not request_deadline.expired():
+            time.sleep(0.01)
+        raise HTTPException(status_code=504, detail="cancelled")
+
+    monkeypatch.setattr(server, "_run_response", fake_run_response)
+    monkeypatch.setattr(server, "DISCONNECT_POLL_SECONDS", 0.05)
+    request = _Request()
+    items = [{"index": index} for index in range(8)]
+
+    async def consume():
+        lines = []
+        async for line in server._stream_batch(items, "model", 3, request):
+            lines.append(json.loads(line))
+            # The client goes away after the first result
+            request.disconnected = True
+        return lines
+
+    lines = asyncio.run(asyncio.wait_for(consume(), timeout=5))
+
+    assert [line["index"] for line in lines] == [0]
+    # The stream ended without waiting for the slow items; their deadlines are all cancelled
+    slow = [item_deadline for index, item_deadline in started.items() if index != 0]
+    assert slow and all(item_deadline.cancelled for item_deadline in slow)
+    # Queued items were not started
+    assert len(started) < len(items)